@@ -3,13 +3,58 @@ import os
 
 class Settings(BaseSettings):
     DATABASE_URL: str = "sqlite:///data/warehouse/kpi_copilot.db"
-    KPI_PLANNER_MODE: str = "auto"    # "auto" | "llm" | "registry"
+    KPI_PLANNER_MODE: str = "auto"    # "auto" | "llm" | "registry" | "speculative"
+    KPI_CUBE: bool = False            # serve /ask group-by switches from a cached per-KPI cube
+    CUBE_TTL: int = 900               # seconds
+    RANGE_REUSE: bool = False         # answer date windows from cached overlapping months (KPIs with month_local: true)
+    RANGE_CACHE_TTL: int = 900        # seconds
+    PARTITION_PRUNING: bool = True    # skip feature_usage/support_tickets partitions outside :start/:end
+    TREND_STATS_SQL: bool = False     # registry plans: MoM/peak/low/shares via window functions, series top-N folded in SQL
+    TREND_TOP_CONTRIB: int = 5        # last-period contributors returned by the SQL summary
+
+    # Chart payload shaping (per-request top_n / max_points override these)
+    CHART_TOP_N: int = 12
+    CHART_MAX_POINTS: int = 2000
+    # Plan / result / narration caches
+    CACHE_BACKEND: str = "memory"     # "memory" (per worker) | "sqlite" (shared by all workers on the host)
+    CACHE_PATH: str = "data/cache/insightminer_cache.db"
+    CACHE_MAX_BYTES: int = 256 * 1024 * 1024
+    CACHE_TTLS: dict[str, int] = {}   # per-namespace override, e.g. {"narration": 86400}
+
+    # Admission control (max concurrent / max queued / max queue wait in seconds)
+    SQL_MAX_CONCURRENCY: int = 4
+    SQL_MAX_QUEUE: int = 32
+    SQL_MAX_WAIT: float = 5.0
+    LLM_MAX_CONCURRENCY: int = 8
+    LLM_MAX_QUEUE: int = 32
+    LLM_MAX_WAIT: float = 2.0
+
+    RESPONSE_COMPRESS_MIN_BYTES: int = 1024   # gzip/br only above this size
+
+    # Startup: /ready turns 200 once these stages finish (registry, engine, optional queries)
+    WARMUP_ENABLED: bool = True
+    WARMUP_QUERIES: list[str] = []    # KPI questions run once through the registry planner
+    WARMUP_TIMEOUT: float = 30.0      # seconds; queries still running after this are abandoned
 
     # Insights narrator
-    INSIGHTS_MODE: str = "auto"       # "auto" | "llm" | "deterministic"
+    INSIGHTS_MODE: str = "auto"       # "auto" | "llm" | "deterministic" | "hedged"
+    INSIGHTS_DEADLINE: float = 1.5    # seconds; "hedged" returns deterministic bullets after this
     LLM_MODEL: str = "gpt-4o-mini"
     LLM_TIMEOUT: int = 8              # seconds
     LLM_MAX_TOKENS: int = 180         # very small; 2–3 bullets
     OPENAI_API_KEY: str | None = None
 
+    # Circuit breaker around OpenAI (planner + narrator)
+    LLM_BREAKER_WINDOW: int = 20          # recent calls considered
+    LLM_BREAKER_FAILURES: int = 5         # failures in window that open the circuit
+    LLM_BREAKER_SLOW_SECS: float = 6.0    # slower calls count as failures
+    LLM_BREAKER_COOLDOWN: float = 30.0    # seconds open before a half-open probe
+    LLM_BREAKER_HALF_OPEN_CALLS: int = 1
+
+    # Prompt size / spend accounting (USD per 1M tokens; defaults are gpt-4o-mini list prices)
+    LLM_PROMPT_TOKEN_BUDGET: int = 1500   # static planner prefix is trimmed to fit
+    LLM_PRICE_INPUT_PER_1M: float = 0.15
+    LLM_PRICE_CACHED_INPUT_PER_1M: float = 0.075
+    LLM_PRICE_OUTPUT_PER_1M: float = 0.60
+
 settings = Settings()
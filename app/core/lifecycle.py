@@ -0,0 +1,100 @@
+from __future__ import annotations
+import logging, threading, time
+from typing import Any, Callable, Dict, List, Optional
+from app.core.config import settings
+
+log = logging.getLogger(__name__)
+
+class Startup:
+    """Staged warm-up run off the request path; /ready reports its progress."""
+
+    def __init__(self) -> None:
+        self._lock = threading.Lock()
+        self._done = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+        self.stages: Dict[str, float] = {}    # stage -> seconds
+        self.error: Optional[str] = None
+        self.started_at: Optional[float] = None
+
+    @property
+    def ready(self) -> bool:
+        return self._done.is_set() and self.error is None
+
+    def _stage(self, name: str, fn: Callable[[], Any]) -> None:
+        t0 = time.perf_counter()
+        fn()
+        with self._lock:
+            self.stages[name] = round(time.perf_counter() - t0, 4)
+        log.info("startup stage %s took %.3fs", name, self.stages[name])
+
+    def _run(self, stages: List[tuple]) -> None:
+        try:
+            for name, fn in stages:
+                self._stage(name, fn)
+        except Exception as e:
+            self.error = f"{type(e).__name__}: {e}"
+            log.exception("startup failed")
+        finally:
+            self._done.set()
+
+    def start(self) -> None:
+        with self._lock:
+            if self._thread is not None:
+                return
+            self.started_at = time.time()
+            stages = _stages() if settings.WARMUP_ENABLED else []
+            self._thread = threading.Thread(target=self._run, args=(stages,), name="startup", daemon=True)
+            self._thread.start()
+
+    def wait(self, timeout: Optional[float] = None) -> bool:
+        return self._done.wait(timeout)
+
+    def snapshot(self) -> Dict[str, Any]:
+        with self._lock:
+            return {
+                "ready": self.ready,
+                "done": self._done.is_set(),
+                "error": self.error,
+                "stages": dict(self.stages),
+                "total_secs": round(sum(self.stages.values()), 4),
+            }
+
+def _imports() -> None:
+    # the modules /ask and /ask-llm import inside their handlers
+    import app.services.chart_builder, app.services.cube, app.services.range_cache, app.services.trend_sql  # noqa: F401
+    import app.services.planner_llm, app.services.narrator_llm  # noqa: F401
+
+def _registry() -> None:
+    from app.services.planner_registry import get_registry
+    get_registry()
+
+def _engine() -> None:
+    from app.services.executor import get_engine
+    with get_engine().connect() as con:
+        con.exec_driver_sql("SELECT 1").fetchall()
+
+def _queries() -> None:
+    from concurrent.futures import ThreadPoolExecutor, TimeoutError as FutureTimeout
+    from app.services.planner_registry import plan_from_registry
+    from app.services.range_cache import run_registry_sql
+
+    def run() -> None:
+        for q in settings.WARMUP_QUERIES:
+            plan = plan_from_registry(q, "2024-01-01", "2024-12-31", None)
+            run_registry_sql(plan["sql"], "2024-01-01", "2024-12-31", plan["meta"].get("month_local", False))
+
+    pool = ThreadPoolExecutor(max_workers=1, thread_name_prefix="warmup")
+    try:
+        pool.submit(run).result(timeout=settings.WARMUP_TIMEOUT)
+    except FutureTimeout:
+        log.warning("warm-up queries still running after %.1fs; marking ready anyway", settings.WARMUP_TIMEOUT)
+    finally:
+        pool.shutdown(wait=False)
+
+def _stages() -> List[tuple]:
+    stages = [("imports", _imports), ("registry", _registry), ("engine", _engine)]
+    if settings.WARMUP_QUERIES:
+        stages.append(("queries", _queries))
+    return stages
+
+STARTUP = Startup()
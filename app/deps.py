@@ -1,8 +1,25 @@
 import os
+import threading
+from typing import Optional
 from sqlalchemy import create_engine, text
 from sqlalchemy.engine import Engine
 
 DB_URI = os.getenv("DB_URI", "sqlite:///data/warehouse/kpi_copilot.db")
 
-# sqlite needs check_same_thread=False when used in ASGI contexts
-engine: Engine = create_engine(DB_URI, connect_args={"check_same_thread": False})
\ No newline at end of file
+_engine: Optional[Engine] = None
+_lock = threading.Lock()
+
+def get_engine() -> Engine:
+    global _engine
+    if _engine is None:
+        with _lock:
+            if _engine is None:
+                # sqlite needs check_same_thread=False when used in ASGI contexts
+                _engine = create_engine(DB_URI, connect_args={"check_same_thread": False})
+    return _engine
+
+def __getattr__(name: str):
+    # `from app.deps import engine` still works, created on first access
+    if name == "engine":
+        return get_engine()
+    raise AttributeError(name)
@@ -1,11 +1,18 @@
+from contextlib import asynccontextmanager
 from fastapi import FastAPI
 from fastapi.middleware.cors import CORSMiddleware
+from app.core.lifecycle import STARTUP
 from app.routers import ask, health
-from app.routers import ask, ask_llm
+from app.routers import ask, ask_llm, metrics
 
 
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    # warm up in the background so the process accepts /health immediately; /health/ready gates traffic
+    STARTUP.start()
+    yield
 
-app = FastAPI(title="KPI Copilot API")
+app = FastAPI(title="KPI Copilot API", lifespan=lifespan)
 app.add_middleware(
     CORSMiddleware,
     allow_origins=["*"], allow_credentials=True, allow_methods=["*"], allow_headers=["*"]
@@ -14,6 +21,7 @@ app.add_middleware(
 app.include_router(health.router)
 app.include_router(ask.router)
 app.include_router(ask_llm.router)
+app.include_router(metrics.router)
 
 @app.get("/")
 def root():
@@ -6,6 +6,8 @@ class AskRequest(BaseModel):
     start: Optional[str] = None  # "2024-01-01"
     end: Optional[str] = None    # "2024-12-31"
     dims: Optional[List[str]] = None  # ["region"]
+    top_n: Optional[int] = None       # keep N largest dimension values, rest -> "Other" (0 = off)
+    max_points: Optional[int] = None  # downsample chart series to ~N points (0 = off)
 
 class ChartSeries(BaseModel):
     period: str
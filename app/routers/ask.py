@@ -1,26 +1,38 @@
-from fastapi import APIRouter, HTTPException
-from sqlalchemy import text
+from fastapi import APIRouter, HTTPException, Request
 from app.models.dto import AskRequest, AskResponse
-from app.services.planner_registry import plan_from_registry
-from app.services.executor import run_sql
-from app.services.chart_builder import build_time_series
 from app.services.narrator import narrate_insights
-import numpy as np
-import pandas as pd
+from app.services.encoding import encode_response
+from app.services.admission import Overloaded
+from app.core.config import settings
 
 router = APIRouter(prefix="/ask", tags=["ask"])
 
 @router.post("/")
-def ask(req: AskRequest):
+def ask(req: AskRequest, request: Request):
+    # heavy deps load on first request (or startup warm-up), not when the app is imported
+    import numpy as np
+    from app.services.planner_registry import plan_from_registry
+    from app.services.chart_builder import build_time_series
+    from app.services.cube import answer_from_cube
+    from app.services.range_cache import run_registry_sql
+    from app.services.trend_sql import summarize
     try:
         start = req.start or "2024-01-01"
         end   = req.end   or "2024-12-31"
-        plan = plan_from_registry(req.question, start, end, req.dims)
-        sql, meta = plan["sql"], plan["meta"]
-
-        # bind params safely
-        sql_parametrized = text(sql).bindparams(start=start, end=end)
-        df = run_sql(sql_parametrized.text.replace(":start", f"'{start}'").replace(":end", f"'{end}'"))
+        top_n = settings.CHART_TOP_N if req.top_n is None else req.top_n
+        served = answer_from_cube(req.question, start, end, req.dims) if settings.KPI_CUBE else None
+        stats = None
+        if served is not None:
+            df, plan = served
+            sql, meta = plan["sql"], plan["meta"]
+        else:
+            plan = plan_from_registry(req.question, start, end, req.dims)
+            sql, meta = plan["sql"], plan["meta"]
+            if settings.TREND_STATS_SQL:
+                # grouped plans: stats computed by SQLite, df is only the (top-N folded) chart series
+                stats, df = summarize(sql, start, end, meta, top_n, settings.TREND_TOP_CONTRIB)
+            else:
+                df = run_registry_sql(sql, start, end, meta.get("month_local", False))
 
         if df.empty:
             raise ValueError("No data for the selected period/filters.")
@@ -29,51 +41,58 @@ def ask(req: AskRequest):
         df.columns = [c.lower() for c in df.columns]
         df = df.sort_values(df.columns[0])
 
-        # compute stats (same as before)
-        if len(df.columns) >= 3:
-            period_col, value_col = df.columns[0], df.columns[1]
-            agg = df.groupby(period_col)[value_col].sum().reset_index()
-            s = agg[value_col].values
-            periods = agg[period_col].astype(str).values
-        else:
-            period_col, value_col = df.columns[0], df.columns[1]
-            s = df[value_col].fillna(0).values
-            periods = df[period_col].astype(str).values
+        if stats is None:
+            if len(df.columns) >= 3:
+                period_col, value_col = df.columns[0], df.columns[1]
+                agg = df.groupby(period_col)[value_col].sum().reset_index()
+                s = agg[value_col].values
+                periods = agg[period_col].astype(str).values
+            else:
+                period_col, value_col = df.columns[0], df.columns[1]
+                s = df[value_col].fillna(0).values
+                periods = df[period_col].astype(str).values
 
-        start_val = float(s[0]); end_val = float(s[-1])
-        total_delta_pct = ((end_val - start_val) / (start_val or 1)) * 100.0
-        pct_changes = [((s[i]-s[i-1]) / (s[i-1] or 1) * 100.0) for i in range(1, len(s))] if len(s) > 1 else [0.0]
-        avg_mom = float(np.mean(pct_changes))
-        peak_i, low_i = int(np.argmax(s)), int(np.argmin(s))
+            start_val = float(s[0]); end_val = float(s[-1])
+            total_delta_pct = ((end_val - start_val) / (start_val or 1)) * 100.0
+            pct_changes = [((s[i]-s[i-1]) / (s[i-1] or 1) * 100.0) for i in range(1, len(s))] if len(s) > 1 else [0.0]
+            avg_mom = float(np.mean(pct_changes))
+            peak_i, low_i = int(np.argmax(s)), int(np.argmin(s))
 
-        # top contributors last period if grouped
-        top_contrib = None
-        if len(df.columns) >= 3:
-            dim_col = df.columns[2]
-            last_period = periods[-1]
-            snap = df[df[period_col] == last_period]
-            tot = snap[value_col].sum() or 1.0
-            snap = snap.assign(share=snap[value_col] / tot * 100.0).sort_values("share", ascending=False)
-            top_contrib = [(row[dim_col], float(row[value_col]), float(row["share"])) for _, row in snap.iterrows()]
+            # top contributors last period if grouped
+            top_contrib = None
+            if len(df.columns) >= 3:
+                dim_col = df.columns[2]
+                last_period = periods[-1]
+                snap = df[df[period_col] == last_period]
+                tot = snap[value_col].sum() or 1.0
+                snap = snap.assign(share=snap[value_col] / tot * 100.0).sort_values("share", ascending=False)
+                top_contrib = [(row[dim_col], float(row[value_col]), float(row["share"])) for _, row in snap.iterrows()]
 
-        stats = {
-            "unit": meta.get("unit"),
-            "start_value": start_val,
-            "end_value": end_val,
-            "total_delta_pct": total_delta_pct,
-            "avg_mom_pct": avg_mom,
-            "peak": (periods[peak_i], float(s[peak_i])),
-            "lowest": (periods[low_i], float(s[low_i])),
-            "top_contrib": top_contrib,
-        }
+            stats = {
+                "unit": meta.get("unit"),
+                "start_value": start_val,
+                "end_value": end_val,
+                "total_delta_pct": total_delta_pct,
+                "avg_mom_pct": avg_mom,
+                "peak": (periods[peak_i], float(s[peak_i])),
+                "lowest": (periods[low_i], float(s[low_i])),
+                "top_contrib": top_contrib,
+            }
 
-        chart = build_time_series(df, dim_col=meta.get("dimension"), chart_type="line", meta=meta)
+        chart = build_time_series(
+            df, dim_col=meta.get("dimension"), chart_type="line", meta=meta,
+            top_n=(0 if meta.get("stats_source") == "sql" else top_n),   # already folded in SQL
+            additive=bool(meta.get("additive")),   # averages/rates are never summed into Other
+            max_points=(settings.CHART_MAX_POINTS if req.max_points is None else req.max_points),
+        )
         bullets = narrate_insights(stats)
-        return {
+        return encode_response({
         "chart": chart.model_dump() if hasattr(chart, "model_dump") else chart.__dict__,
         "insights": bullets,
         "sql": [sql],
-    }
+    }, request)
 
+    except Overloaded as e:
+        raise e.to_http()
     except Exception as e:
         raise HTTPException(status_code=400, detail=str(e))
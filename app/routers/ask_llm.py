@@ -1,30 +1,36 @@
-from fastapi import APIRouter, HTTPException, Response
-import numpy as np, pandas as pd
+from fastapi import APIRouter, HTTPException, Request, Response
 
 from app.models.dto import AskRequest, AskResponse
-from app.services.planner_llm import plan_with_llm
-from app.services.executor import run_sql
-from app.services.chart_builder import build_time_series
 from app.services.narrator import narrate_insights as deterministic_narrator
-from app.services.narrator_llm import narrate_with_llm
+from app.services.encoding import encode_response
+from app.services.admission import Overloaded
+from app.services.circuit_breaker import OPENAI_BREAKER
 from app.core.config import settings
 
 router = APIRouter(prefix="/ask-llm", tags=["ask-llm"])
 
 @router.post("", response_model=AskResponse)
-def ask_llm(req: AskRequest, response: Response):
+def ask_llm(req: AskRequest, request: Request, response: Response):
+    # heavy deps load on first request (or startup warm-up), not when the app is imported
+    import numpy as np
+    from app.services.planner_llm import plan_and_execute, plan_and_summarize
+    from app.services.chart_builder import build_time_series
+    from app.services.narrator_llm import narrate_with_llm, narrate_with_deadline
     try:
         start = req.start or "2024-01-01"
         end   = req.end   or "2024-12-31"
 
-        plan = plan_with_llm(req.question, start, end, req.dims or [])
-        if not plan or "sql" not in plan or "meta" not in plan:
-            raise ValueError("Planner returned no plan")
-
+        top_n = settings.CHART_TOP_N if req.top_n is None else req.top_n
+        stats = None
+        if settings.TREND_STATS_SQL:
+            # grouped registry plans: stats from SQLite, df is only the (top-N folded) chart series
+            plan, df, stats = plan_and_summarize(req.question, start, end, req.dims or [], top_n,
+                                                 settings.TREND_TOP_CONTRIB)
+        else:
+            plan, df = plan_and_execute(req.question, start, end, req.dims or [])
         sql, meta = plan["sql"], plan["meta"]
         response.headers["X-Planner"] = meta.get("planner", "unknown")
 
-        df = run_sql(sql.replace(":start", f"'{start}'").replace(":end", f"'{end}'"))
         if df.empty:
             raise ValueError("No data for the selected period/filters.")
 
@@ -32,35 +38,40 @@ def ask_llm(req: AskRequest, response: Response):
         df = df.sort_values(df.columns[0])  # period asc
 
         # ---------- compute stats for narrator ----------
-        period_col, value_col = df.columns[0], df.columns[1]
-        if len(df.columns) >= 3:
-            agg = df.groupby(period_col)[value_col].sum().reset_index()
-        else:
-            agg = df[[period_col, value_col]]
+        if stats is None:
+            period_col, value_col = df.columns[0], df.columns[1]
+            if len(df.columns) >= 3:
+                agg = df.groupby(period_col)[value_col].sum().reset_index()
+            else:
+                agg = df[[period_col, value_col]]
 
-        s = agg[value_col].fillna(0).to_numpy()
-        periods = agg[period_col].astype(str).to_numpy()
-        start_val, end_val = float(s[0]), float(s[-1])
-        total_delta_pct = ((end_val - start_val) / (start_val or 1)) * 100.0
-        pct_changes = [((s[i]-s[i-1])/(s[i-1] or 1)*100.0) for i in range(1,len(s))] if len(s)>1 else [0.0]
-        avg_mom = float(np.mean(pct_changes))
-        peak_i, low_i = int(np.argmax(s)), int(np.argmin(s))
-        stats = {
-            "unit": meta.get("unit"),
-            "start_value": start_val,
-            "end_value": end_val,
-            "total_delta_pct": total_delta_pct,
-            "avg_mom_pct": avg_mom,
-            "peak": (periods[peak_i], float(s[peak_i])),
-            "lowest": (periods[low_i], float(s[low_i])),
-        }
+            s = agg[value_col].fillna(0).to_numpy()
+            periods = agg[period_col].astype(str).to_numpy()
+            start_val, end_val = float(s[0]), float(s[-1])
+            total_delta_pct = ((end_val - start_val) / (start_val or 1)) * 100.0
+            pct_changes = [((s[i]-s[i-1])/(s[i-1] or 1)*100.0) for i in range(1,len(s))] if len(s)>1 else [0.0]
+            avg_mom = float(np.mean(pct_changes))
+            peak_i, low_i = int(np.argmax(s)), int(np.argmin(s))
+            stats = {
+                "unit": meta.get("unit"),
+                "start_value": start_val,
+                "end_value": end_val,
+                "total_delta_pct": total_delta_pct,
+                "avg_mom_pct": avg_mom,
+                "peak": (periods[peak_i], float(s[peak_i])),
+                "lowest": (periods[low_i], float(s[low_i])),
+            }
 
         # ---------- choose narrator ----------
         mode = (settings.INSIGHTS_MODE or "auto").lower()
         bullets = None
         source = "deterministic"
 
-        if mode in ("llm", "auto"):
+        if mode == "hedged":
+            bullets, source = narrate_with_deadline(
+                stats, df, deterministic_narrator, settings.INSIGHTS_DEADLINE
+            )
+        elif mode in ("llm", "auto"):
             bullets = narrate_with_llm(stats, df)
             if bullets:
                 source = "llm"
@@ -74,10 +85,19 @@ def ask_llm(req: AskRequest, response: Response):
             source = "deterministic"
 
         response.headers["X-Insights-Source"] = source
+        response.headers["X-LLM-Circuit"] = OPENAI_BREAKER.state
         meta["insights_source"] = source  # surface in JSON too
 
-        chart = build_time_series(df, dim_col=meta.get("dimension"), chart_type="line", meta=meta)
-        return AskResponse(chart=chart, insights=bullets, sql=[sql])
+        chart = build_time_series(
+            df, dim_col=meta.get("dimension"), chart_type="line", meta=meta,
+            top_n=(0 if meta.get("stats_source") == "sql" else top_n),   # already folded in SQL
+            additive=bool(meta.get("additive")),   # LLM SQL has no flag: never summed into Other
+            max_points=(settings.CHART_MAX_POINTS if req.max_points is None else req.max_points),
+        )
+        body = AskResponse(chart=chart, insights=bullets, sql=[sql])
+        return encode_response(body.model_dump(), request, headers=response.headers)
 
+    except Overloaded as e:
+        raise e.to_http()
     except Exception as e:
         raise HTTPException(status_code=400, detail=str(e))
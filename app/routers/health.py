@@ -1,6 +1,14 @@
 from fastapi import APIRouter
+from fastapi.responses import JSONResponse
+from app.core.lifecycle import STARTUP
 router = APIRouter(prefix="/health", tags=["health"])
 
 @router.get("")
 def health():
-    return {"status": "ok"}
\ No newline at end of file
+    return {"status": "ok"}
+
+@router.get("/ready")
+def ready():
+    """Readiness (registry parsed, engine connected, warm-up done); /health is liveness only."""
+    snap = STARTUP.snapshot()
+    return JSONResponse(snap, status_code=200 if snap["ready"] else 503)
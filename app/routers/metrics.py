@@ -0,0 +1,8 @@
+from fastapi import APIRouter
+from app.services import admission
+from app.services.circuit_breaker import OPENAI_BREAKER
+router = APIRouter(prefix="/metrics", tags=["metrics"])
+
+@router.get("")
+def metrics():
+    return {"admission": admission.metrics(), "circuit": {"openai": OPENAI_BREAKER.snapshot()}}
@@ -0,0 +1,157 @@
+from __future__ import annotations
+import heapq, itertools, logging, math, threading, time
+from contextlib import contextmanager
+from typing import Any, Dict, Iterator, List, Optional
+from fastapi import HTTPException
+from app.core.config import settings
+
+log = logging.getLogger(__name__)
+
+# lower value = served first
+PRIORITY_REGISTRY = 0   # SQL gate: registry KPI SQL
+PRIORITY_LLM_SQL = 1    # SQL gate: LLM-generated SQL
+PRIORITY_PLANNER = 0    # LLM gate: planner calls (a miss costs a registry fallback)
+PRIORITY_NARRATOR = 1   # LLM gate: narration (a miss costs deterministic bullets)
+
+class Overloaded(Exception):
+    """Raised instead of queueing when a resource can't admit work in time."""
+
+    def __init__(self, resource: str, status: int, retry_after: float, reason: str):
+        super().__init__(f"{resource} overloaded ({reason}); retry after {retry_after:.0f}s")
+        self.resource = resource
+        self.status = status
+        self.retry_after = retry_after
+        self.reason = reason
+
+    def to_http(self) -> HTTPException:
+        return HTTPException(status_code=self.status, detail=str(self),
+                             headers={"Retry-After": str(max(1, math.ceil(self.retry_after)))})
+
+class _Waiter:
+    __slots__ = ("event", "granted", "evicted", "priority")
+
+    def __init__(self, priority: int):
+        self.event = threading.Event()
+        self.granted = False
+        self.evicted = False
+        self.priority = priority
+
+class AdmissionController:
+    """
+    Concurrency limit with a bounded priority queue. A request is rejected up front
+    when the estimated wait exceeds max_wait (503) or when the queue is full of
+    waiters ranked at or above it (429); a full queue otherwise makes room by
+    evicting its lowest-ranked waiter (503). A request still queued when max_wait
+    runs out is rejected too (503).
+    """
+
+    def __init__(self, name: str, limit: int, max_queue: int, max_wait: float):
+        self.name = name
+        self.limit = max(1, limit)
+        self.max_queue = max_queue
+        self.max_wait = max_wait
+        self._lock = threading.Lock()
+        self._active = 0
+        self._queue: List[tuple[int, int, _Waiter]] = []
+        self._seq = itertools.count()
+        self._service_ewma: Optional[float] = None
+        self._admitted = 0
+        self._rejected: Dict[str, int] = {"queue_full": 0, "deadline": 0, "timeout": 0, "evicted": 0}
+        self._wait_total = 0.0
+        self._wait_max = 0.0
+
+    def _estimate_wait(self, ahead: int) -> Optional[float]:
+        if self._service_ewma is None:
+            return None
+        return self._service_ewma * math.ceil((ahead + 1) / self.limit)
+
+    def _record_wait(self, waited: float) -> None:
+        self._admitted += 1
+        self._wait_total += waited
+        self._wait_max = max(self._wait_max, waited)
+
+    def _reject(self, reason: str, status: int, retry_after: float) -> Overloaded:
+        self._rejected[reason] += 1
+        log.warning("admission=reject resource=%s reason=%s queue=%d active=%d",
+                    self.name, reason, len(self._queue), self._active)
+        return Overloaded(self.name, status, retry_after, reason)
+
+    def acquire(self, priority: int = 0) -> None:
+        t0 = time.monotonic()
+        with self._lock:
+            if self._active < self.limit and not self._queue:
+                self._active += 1
+                self._record_wait(0.0)
+                return
+            ahead = sum(1 for p, _, _ in self._queue if p <= priority)
+            est = self._estimate_wait(ahead)
+            if est is not None and est > self.max_wait:
+                raise self._reject("deadline", 503, est)
+            if len(self._queue) >= self.max_queue:
+                # lower-priority waiters give way to this arrival; equals and betters don't
+                victim = max(self._queue, default=None)
+                if victim is None or victim[0] <= priority:
+                    raise self._reject("queue_full", 429, self._estimate_wait(len(self._queue)) or self.max_wait)
+                self._queue.remove(victim)
+                heapq.heapify(self._queue)
+                victim[2].evicted = True
+                victim[2].event.set()
+            w = _Waiter(priority)
+            heapq.heappush(self._queue, (priority, next(self._seq), w))
+
+        if not w.event.wait(self.max_wait):
+            with self._lock:
+                if not w.granted and not w.evicted:
+                    self._queue = [e for e in self._queue if e[2] is not w]
+                    heapq.heapify(self._queue)
+                    raise self._reject("timeout", 503, self._estimate_wait(len(self._queue)) or self.max_wait)
+        with self._lock:
+            if w.evicted:
+                raise self._reject("evicted", 503, self._estimate_wait(len(self._queue)) or self.max_wait)
+            self._record_wait(time.monotonic() - t0)
+
+    def release(self, service_secs: float) -> None:
+        with self._lock:
+            prev = self._service_ewma
+            self._service_ewma = service_secs if prev is None else 0.8 * prev + 0.2 * service_secs
+            if self._queue:
+                # hand the slot straight to the best waiter; _active is unchanged
+                _, _, w = heapq.heappop(self._queue)
+                w.granted = True
+                w.event.set()
+            else:
+                self._active -= 1
+
+    @contextmanager
+    def slot(self, priority: int = 0) -> Iterator[None]:
+        self.acquire(priority)
+        t0 = time.monotonic()
+        try:
+            yield
+        finally:
+            self.release(time.monotonic() - t0)
+
+    def snapshot(self) -> Dict[str, Any]:
+        with self._lock:
+            by_priority: Dict[int, int] = {}
+            for p, _, _ in self._queue:
+                by_priority[p] = by_priority.get(p, 0) + 1
+            return {
+                "limit": self.limit,
+                "in_flight": self._active,
+                "queue_depth": len(self._queue),
+                "queue_depth_by_priority": by_priority,
+                "max_queue": self.max_queue,
+                "max_wait_s": self.max_wait,
+                "admitted": self._admitted,
+                "rejected": dict(self._rejected),
+                "wait_avg_ms": (self._wait_total / self._admitted * 1000.0) if self._admitted else 0.0,
+                "wait_max_ms": self._wait_max * 1000.0,
+                "service_ewma_ms": (self._service_ewma or 0.0) * 1000.0,
+            }
+
+SQL_GATE = AdmissionController("sql", settings.SQL_MAX_CONCURRENCY, settings.SQL_MAX_QUEUE, settings.SQL_MAX_WAIT)
+LLM_GATE = AdmissionController("llm", settings.LLM_MAX_CONCURRENCY, settings.LLM_MAX_QUEUE, settings.LLM_MAX_WAIT)
+
+def metrics() -> Dict[str, Any]:
+    return {"sql": SQL_GATE.snapshot(), "llm": LLM_GATE.snapshot()}
@@ -0,0 +1,193 @@
+from __future__ import annotations
+import hashlib, logging, pickle, sqlite3, threading, time
+from collections import OrderedDict
+from pathlib import Path
+from typing import Any, Hashable, Optional
+
+log = logging.getLogger(__name__)
+
+class TTLCache:
+    """Small thread-safe LRU with per-entry expiry (in-process only)."""
+
+    def __init__(self, maxsize: int = 256, ttl: float = 3600.0):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self._data: "OrderedDict[Hashable, tuple[float, Any]]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key: Hashable) -> Optional[Any]:
+        with self._lock:
+            hit = self._data.get(key)
+            if hit is None:
+                return None
+            expires, value = hit
+            if expires < time.monotonic():
+                del self._data[key]
+                return None
+            self._data.move_to_end(key)
+            return value
+
+    def set(self, key: Hashable, value: Any) -> None:
+        with self._lock:
+            self._data[key] = (time.monotonic() + self.ttl, value)
+            self._data.move_to_end(key)
+            while len(self._data) > self.maxsize:
+                self._data.popitem(last=False)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._data.clear()
+
+
+# ---------- Shared (cross-process) backend ----------
+class SqliteCacheStore:
+    """
+    On-disk cache shared by every worker on the host. Each write is one SQLite
+    transaction (atomic under WAL); total payload is kept under max_bytes by
+    evicting least-recently-accessed rows.
+    """
+
+    _TOUCH_EVERY = 60.0   # seconds; avoids a write on every hit
+
+    def __init__(self, path: str, max_bytes: int):
+        self.path = path
+        self.max_bytes = max_bytes
+        self._local = threading.local()
+        Path(path).expanduser().parent.mkdir(parents=True, exist_ok=True)
+        with self._con() as con:
+            con.execute("""
+                CREATE TABLE IF NOT EXISTS cache (
+                    ns TEXT NOT NULL, key TEXT NOT NULL, value BLOB NOT NULL,
+                    size INTEGER NOT NULL, expires REAL NOT NULL, accessed REAL NOT NULL,
+                    PRIMARY KEY (ns, key)
+                ) WITHOUT ROWID""")
+            con.execute("CREATE INDEX IF NOT EXISTS idx_cache_accessed ON cache(accessed)")
+
+    def _con(self) -> sqlite3.Connection:
+        con = getattr(self._local, "con", None)
+        if con is None:
+            con = sqlite3.connect(self.path, timeout=5.0, isolation_level=None)
+            con.execute("PRAGMA journal_mode=WAL")
+            con.execute("PRAGMA synchronous=NORMAL")
+            con = _Tx(con)
+            self._local.con = con
+        return con
+
+    def get(self, ns: str, key: str) -> Optional[Any]:
+        now = time.time()
+        con = self._con()
+        row = con.raw.execute(
+            "SELECT value, expires, accessed FROM cache WHERE ns=? AND key=?", (ns, key)
+        ).fetchone()
+        if row is None:
+            return None
+        value, expires, accessed = row
+        if expires < now:
+            with con:
+                con.execute("DELETE FROM cache WHERE ns=? AND key=? AND expires<?", (ns, key, now))
+            return None
+        if now - accessed > self._TOUCH_EVERY:
+            with con:
+                con.execute("UPDATE cache SET accessed=? WHERE ns=? AND key=?", (now, ns, key))
+        try:
+            return pickle.loads(value)
+        except Exception:
+            return None
+
+    def set(self, ns: str, key: str, value: Any, ttl: float) -> None:
+        blob = pickle.dumps(value, protocol=pickle.HIGHEST_PROTOCOL)
+        if len(blob) > self.max_bytes:
+            return
+        now = time.time()
+        with self._con() as con:
+            con.execute(
+                "INSERT OR REPLACE INTO cache (ns, key, value, size, expires, accessed) "
+                "VALUES (?, ?, ?, ?, ?, ?)", (ns, key, blob, len(blob), now + ttl, now))
+            con.execute("DELETE FROM cache WHERE expires < ?", (now,))
+            total = con.execute("SELECT COALESCE(SUM(size), 0) FROM cache").fetchone()[0]
+            if total > self.max_bytes:
+                # evict oldest-accessed rows until the new total fits
+                con.execute("""
+                    DELETE FROM cache WHERE (ns, key) IN (
+                        SELECT ns, key FROM (
+                            SELECT ns, key, SUM(size) OVER (ORDER BY accessed, ns, key) AS running
+                            FROM cache
+                        ) WHERE running <= ?
+                    )""", (total - self.max_bytes,))
+                # and the boundary row, if still over
+                total = con.execute("SELECT COALESCE(SUM(size), 0) FROM cache").fetchone()[0]
+                if total > self.max_bytes:
+                    con.execute("DELETE FROM cache WHERE (ns, key) IN "
+                                "(SELECT ns, key FROM cache ORDER BY accessed LIMIT 1)")
+
+    def clear(self, ns: str) -> None:
+        with self._con() as con:
+            con.execute("DELETE FROM cache WHERE ns=?", (ns,))
+
+class _Tx:
+    """Connection wrapper whose context manager is BEGIN IMMEDIATE ... COMMIT/ROLLBACK."""
+
+    def __init__(self, con: sqlite3.Connection):
+        self.raw = con
+
+    def execute(self, *args):
+        return self.raw.execute(*args)
+
+    def __enter__(self):
+        self.raw.execute("BEGIN IMMEDIATE")
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.raw.execute("ROLLBACK" if exc_type else "COMMIT")
+        return False
+
+class SharedCache:
+    """TTLCache-compatible view of one namespace in the shared store."""
+
+    def __init__(self, store: SqliteCacheStore, namespace: str, ttl: float):
+        self.store = store
+        self.namespace = namespace
+        self.ttl = ttl
+
+    @staticmethod
+    def _key(key: Hashable) -> str:
+        return hashlib.sha256(repr(key).encode("utf-8")).hexdigest()
+
+    def get(self, key: Hashable) -> Optional[Any]:
+        try:
+            return self.store.get(self.namespace, self._key(key))
+        except sqlite3.Error as e:
+            log.warning("cache=shared op=get ns=%s err=%s", self.namespace, e)
+            return None
+
+    def set(self, key: Hashable, value: Any) -> None:
+        try:
+            self.store.set(self.namespace, self._key(key), value, self.ttl)
+        except (sqlite3.Error, pickle.PicklingError, TypeError) as e:
+            log.warning("cache=shared op=set ns=%s err=%s", self.namespace, e)
+
+    def clear(self) -> None:
+        self.store.clear(self.namespace)
+
+_STORE: Optional[SqliteCacheStore] = None
+_STORE_LOCK = threading.Lock()
+
+def _shared_store() -> SqliteCacheStore:
+    global _STORE
+    with _STORE_LOCK:
+        if _STORE is None:
+            from app.core.config import settings
+            _STORE = SqliteCacheStore(settings.CACHE_PATH, settings.CACHE_MAX_BYTES)
+        return _STORE
+
+def get_cache(namespace: str, maxsize: int = 256, ttl: float = 3600.0):
+    """
+    Cache for one namespace. CACHE_BACKEND="sqlite" shares entries across all
+    workers on the host; "memory" keeps a per-process TTLCache. CACHE_TTLS
+    overrides `ttl` per namespace.
+    """
+    from app.core.config import settings
+    ttl = settings.CACHE_TTLS.get(namespace, ttl)
+    if (settings.CACHE_BACKEND or "memory").lower() == "sqlite":
+        return SharedCache(_shared_store(), namespace, ttl)
+    return TTLCache(maxsize=maxsize, ttl=ttl)
@@ -1,7 +1,81 @@
-from typing import Dict, List
+from typing import Dict, List, Optional
+import numpy as np
+import pandas as pd
 from app.models.dto import ChartPayload, ChartSeries
 
-def build_time_series(df, dim_col=None, chart_type="line", meta: Dict=None) -> ChartPayload:
+OTHER_LABEL = "Other"
+
+def _top_n(df: pd.DataFrame, n: int, additive: bool) -> tuple[pd.DataFrame, int]:
+    """
+    Keep the n largest dimension values (by |total|). Additive KPIs sum the rest into
+    OTHER_LABEL; for averages and rates a sum means nothing, so the rest is dropped.
+    """
+    period_col, value_col, dim_col = df.columns[:3]
+    totals = df.groupby(dim_col)[value_col].sum().abs().sort_values(ascending=False)
+    if len(totals) <= n:
+        return df, 0
+    keep = set(totals.index[:n])
+    mask = df[dim_col].isin(keep)
+    parts = [df[mask]]
+    if additive:
+        other = (df[~mask].groupby(period_col)[value_col].sum().reset_index()
+                 .assign(**{dim_col: OTHER_LABEL}))
+        parts.append(other[[period_col, value_col, dim_col]])
+    out = pd.concat(parts, ignore_index=True)
+    return out.sort_values([period_col, dim_col]).reset_index(drop=True), len(totals) - n
+
+def _lttb(y: np.ndarray, threshold: int) -> np.ndarray:
+    """Largest-Triangle-Three-Buckets: indices of `threshold` points that preserve the shape."""
+    n = len(y)
+    if threshold >= n or threshold < 3:
+        return np.arange(n)
+    x = np.arange(n, dtype=float)
+    idx = [0]
+    every = (n - 2) / (threshold - 2)
+    a = 0
+    for i in range(threshold - 2):
+        lo, hi = int(i * every) + 1, int((i + 1) * every) + 1
+        nlo, nhi = hi, min(int((i + 2) * every) + 1, n)
+        avg_x, avg_y = x[nlo:nhi].mean(), y[nlo:nhi].mean()
+        area = np.abs((x[a] - avg_x) * (y[lo:hi] - y[a]) - (x[a] - x[lo:hi]) * (avg_y - y[a]))
+        a = lo + int(np.argmax(area))
+        idx.append(a)
+    idx.append(n - 1)
+    return np.asarray(idx)
+
+def _downsample(df: pd.DataFrame, max_points: int, grouped: bool) -> pd.DataFrame:
+    period_col, value_col = df.columns[:2]
+    if not grouped:
+        y = df[value_col].fillna(0).to_numpy(dtype=float)
+        return df.iloc[_lttb(y, max_points)]
+    # share the point budget across dimension values
+    dim_col = df.columns[2]
+    per_series = max(3, max_points // max(df[dim_col].nunique(), 1))
+    parts = []
+    for _, g in df.groupby(dim_col, sort=False):
+        y = g[value_col].fillna(0).to_numpy(dtype=float)
+        parts.append(g.iloc[_lttb(y, per_series)])
+    return pd.concat(parts).sort_values([period_col, dim_col])
+
+def build_time_series(df, dim_col=None, chart_type="line", meta: Dict=None,
+                      top_n: Optional[int] = None, max_points: Optional[int] = None,
+                      additive: bool = False) -> ChartPayload:
+    meta = {} if meta is None else meta   # reductions are recorded in the caller's dict
+    cols = df.columns.tolist()
+    grouped = bool(dim_col) and len(cols) > 2
+    rows_in = len(df)
+    if grouped and top_n:
+        df, folded = _top_n(df, top_n, additive)
+        if folded:
+            meta["top_n"] = ({"n": top_n, "other_label": OTHER_LABEL, "folded_values": folded} if additive
+                             else {"n": top_n, "other_label": None, "dropped_values": folded})
+    if max_points and len(df) > max_points:
+        before = len(df)
+        df = _downsample(df, max_points, grouped)
+        meta["downsampled"] = {"method": "lttb", "from_points": before, "to_points": len(df)}
+    if len(df) != rows_in:
+        meta["reduced"] = True
+
     series: List[ChartSeries] = []
     cols = df.columns.tolist()
     # expected: period, value, [dimension]
@@ -11,4 +85,4 @@ def build_time_series(df, dim_col=None, chart_type="line", meta: Dict=None) -> C
             value=float(row[cols[1]]) if row[cols[1]] is not None else 0.0,
             dimension=(str(row[cols[2]]) if dim_col and cols.__len__() > 2 else None)
         ))
-    return ChartPayload(type=chart_type, series=series, meta=meta or {})
+    return ChartPayload(type=chart_type, series=series, meta=meta)
@@ -0,0 +1,120 @@
+from __future__ import annotations
+import logging, threading, time
+from collections import deque
+from contextlib import contextmanager
+from typing import Any, Deque, Dict, Iterator, Tuple
+from app.core.config import settings
+
+log = logging.getLogger(__name__)
+
+CLOSED, OPEN, HALF_OPEN = "closed", "open", "half_open"
+
+class CircuitOpen(Exception):
+    """The breaker is refusing calls; use the non-LLM path straight away."""
+
+class CircuitBreaker:
+    """
+    Tracks the last `window` calls; a call fails if it raises or takes longer than
+    `slow_secs`. With `failures` or more failures in the window the breaker opens
+    and rejects calls for `cooldown` seconds, then lets `half_open_calls` trial
+    calls through: a success closes it, a failure re-opens it.
+    """
+
+    def __init__(self, name: str, window: int, failures: int, slow_secs: float,
+                 cooldown: float, half_open_calls: int = 1):
+        self.name = name
+        self.failures = failures
+        self.slow_secs = slow_secs
+        self.cooldown = cooldown
+        self.half_open_calls = half_open_calls
+        self._lock = threading.Lock()
+        self._calls: Deque[Tuple[bool, float]] = deque(maxlen=window)
+        self._state = CLOSED
+        self._opened_at = 0.0
+        self._trials = 0
+        self._rejected = 0
+        self._transitions = 0
+
+    @property
+    def state(self) -> str:
+        with self._lock:
+            self._maybe_half_open()
+            return self._state
+
+    def _set(self, state: str) -> None:
+        if state != self._state:
+            log.warning("circuit=%s state=%s->%s", self.name, self._state, state)
+            self._state = state
+            self._transitions += 1
+
+    def _maybe_half_open(self) -> None:
+        if self._state == OPEN and time.monotonic() - self._opened_at >= self.cooldown:
+            self._set(HALF_OPEN)
+            self._trials = 0
+
+    def _acquire(self) -> None:
+        with self._lock:
+            self._maybe_half_open()
+            if self._state == CLOSED:
+                return
+            if self._state == HALF_OPEN and self._trials < self.half_open_calls:
+                self._trials += 1
+                return
+            self._rejected += 1
+            raise CircuitOpen(f"{self.name} circuit is {self._state}")
+
+    def _record(self, ok: bool, latency: float) -> None:
+        ok = ok and latency <= self.slow_secs
+        with self._lock:
+            if self._state == HALF_OPEN:
+                self._trials = max(self._trials - 1, 0)
+                if ok:
+                    self._calls.clear()
+                    self._set(CLOSED)
+                else:
+                    self._opened_at = time.monotonic()
+                    self._set(OPEN)
+                return
+            self._calls.append((ok, latency))
+            if self._state == CLOSED and sum(1 for good, _ in self._calls if not good) >= self.failures:
+                self._opened_at = time.monotonic()
+                self._set(OPEN)
+
+    @contextmanager
+    def guard(self) -> Iterator[None]:
+        """
+        Raise CircuitOpen if the call isn't allowed, otherwise record its outcome.
+        Wrap only the upstream call: time spent queueing locally would count as slowness.
+        """
+        self._acquire()
+        t0 = time.monotonic()
+        try:
+            yield
+        except BaseException:
+            self._record(False, time.monotonic() - t0)
+            raise
+        self._record(True, time.monotonic() - t0)
+
+    def snapshot(self) -> Dict[str, Any]:
+        with self._lock:
+            self._maybe_half_open()
+            lat = [l for _, l in self._calls]
+            return {
+                "state": self._state,
+                "window_calls": len(self._calls),
+                "window_failures": sum(1 for good, _ in self._calls if not good),
+                "avg_latency_ms": (sum(lat) / len(lat) * 1000.0) if lat else 0.0,
+                "rejected": self._rejected,
+                "transitions": self._transitions,
+                "open_for_s": (time.monotonic() - self._opened_at) if self._state == OPEN else 0.0,
+            }
+
+# shared by the planner and the narrator: both talk to the same upstream
+OPENAI_BREAKER = CircuitBreaker(
+    "openai",
+    window=settings.LLM_BREAKER_WINDOW,
+    failures=settings.LLM_BREAKER_FAILURES,
+    slow_secs=settings.LLM_BREAKER_SLOW_SECS,
+    cooldown=settings.LLM_BREAKER_COOLDOWN,
+    half_open_calls=settings.LLM_BREAKER_HALF_OPEN_CALLS,
+)
@@ -0,0 +1,130 @@
+from __future__ import annotations
+import logging
+from dataclasses import dataclass, field
+from itertools import combinations
+from typing import Any, Dict, List, Optional, Tuple
+import pandas as pd
+from app.core.config import settings
+from app.services.cache import get_cache
+from app.services.executor import data_version
+from app.services.range_cache import run_registry_sql
+from app.services.planner_registry import (
+    get_registry, KpiDef, DimensionDef, render_kpi_sql, _find_kpi, _find_dimension,
+)
+
+log = logging.getLogger(__name__)
+
+# (kpi, start, end, data_version) -> Cube
+_CACHE = get_cache("cube", maxsize=64, ttl=settings.CUBE_TTL)
+
+GroupingSet = Tuple[str, ...]   # dimension aliases, in registry order
+
+@dataclass
+class Cube:
+    kpi: str
+    dims: List[str]
+    sql: str
+    sets: Dict[GroupingSet, pd.DataFrame] = field(default_factory=dict)
+
+    def slice(self, dims: List[str]) -> Optional[pd.DataFrame]:
+        """period, value[, dim...] for the requested grouping, or None if not in the cube."""
+        key = tuple(d for d in self.dims if d in dims)
+        if len(key) != len(set(dims)):
+            return None
+        df = self.sets.get(key)
+        return None if df is None else df.copy()
+
+def _grouping_sets(dims: List[DimensionDef]) -> List[List[DimensionDef]]:
+    # grand total, every single dimension, every pair
+    return [[]] + [[d] for d in dims] + [list(p) for p in combinations(dims, 2)]
+
+def _normalize(df: pd.DataFrame, aliases: GroupingSet) -> pd.DataFrame:
+    df = df.copy()
+    df.columns = ["period", "value", *aliases]
+    return df.sort_values(["period", *aliases]).reset_index(drop=True)
+
+def _build_additive(kpi: KpiDef, dims: List[DimensionDef], start: str, end: str) -> Cube:
+    # one pass at the finest grain; every coarser set is a pandas roll-up
+    sql = render_kpi_sql(kpi, dims)
+    aliases = tuple(d.alias for d in dims)
+    base = _normalize(run_registry_sql(sql, start, end, kpi.month_local), aliases)
+    cube = Cube(kpi=kpi.key, dims=list(aliases), sql=sql)
+    for gs in _grouping_sets(dims):
+        key = tuple(d.alias for d in gs)
+        agg = base.groupby(["period", *key], dropna=False)["value"].sum().reset_index()
+        cube.sets[key] = _normalize(agg[["period", "value", *key]], key)
+    return cube
+
+def _build_union(kpi: KpiDef, dims: List[DimensionDef], start: str, end: str) -> Cube:
+    # ratios/averages can't be rolled up, so evaluate every grouping set
+    # in a single statement (one round trip, one read transaction)
+    aliases = tuple(d.alias for d in dims)
+    ctes, arms = [], []
+    for i, gs in enumerate(_grouping_sets(dims)):
+        gs_aliases = [d.alias for d in gs]
+        body = render_kpi_sql(kpi, gs).strip().rstrip(";")
+        ctes.append(f"g{i}({', '.join(['period', 'value', *gs_aliases])}) AS (\n{body}\n)")
+        cols = [a if a in gs_aliases else f"NULL AS {a}" for a in aliases]
+        arms.append(f"SELECT {', '.join(['period', 'value', *cols])}, {i} AS gs FROM g{i}")
+    sql = "WITH " + ",\n".join(ctes) + "\n" + "\nUNION ALL\n".join(arms)
+    df = run_registry_sql(sql, start, end, kpi.month_local)
+    df.columns = ["period", "value", *aliases, "gs"]
+    cube = Cube(kpi=kpi.key, dims=list(aliases), sql=sql)
+    for i, gs in enumerate(_grouping_sets(dims)):
+        key = tuple(d.alias for d in gs)
+        part = df[df["gs"] == i]
+        cube.sets[key] = _normalize(part[["period", "value", *key]], key)
+    return cube
+
+def get_cube(kpi: KpiDef, start: str, end: str) -> Tuple[Cube, bool]:
+    """Return (cube, cache_hit) for a KPI over all of its allowed dimensions."""
+    key = (kpi.key, start, end, data_version())
+    cube = _CACHE.get(key)
+    if cube is not None:
+        return cube, True
+    REG = get_registry()
+    dims = [REG.dimensions[d] for d in kpi.allow_dimensions if d in REG.dimensions]
+    build = _build_additive if kpi.additive else _build_union
+    cube = build(kpi, dims, start, end)
+    log.info("cube=build kpi=%s dims=%s sets=%d", kpi.key, cube.dims, len(cube.sets))
+    _CACHE.set(key, cube)
+    return cube, False
+
+def _resolve_dims(question: str, dims_param: Optional[List[str]], kpi: KpiDef) -> List[DimensionDef]:
+    REG = get_registry()
+    picked = [REG.dimensions[d] for d in (dims_param or [])
+              if d in kpi.allow_dimensions and d in REG.dimensions][:2]
+    if picked:
+        return picked
+    dim = _find_dimension(question, None, kpi)
+    return [dim] if dim else []
+
+def answer_from_cube(question: str, start: str, end: str,
+                     dims_param: Optional[List[str]] = None) -> Optional[Tuple[pd.DataFrame, Dict[str, Any]]]:
+    """
+    Serve a registry question by slicing the cached KPI cube. Two dimensions are
+    returned as one combined `dimension` column ("US · pro"). None if not servable.
+    """
+    kpi = _find_kpi(question)
+    dims = _resolve_dims(question, dims_param, kpi)
+    cube, hit = get_cube(kpi, start, end)
+    df = cube.slice([d.alias for d in dims])
+    if df is None:
+        return None
+    aliases = [d.alias for d in dims]
+    if len(aliases) == 2:
+        label = df[aliases[0]].astype(str) + " · " + df[aliases[1]].astype(str)
+        df = df[["period", "value"]].assign(dimension=label)
+    meta = {
+        "kpi": kpi.key,
+        "unit": kpi.unit,
+        "additive": kpi.additive,
+        "month_local": kpi.month_local,
+        "dimension": (", ".join(aliases) or None),
+        "dimensions": aliases,
+        "start": start,
+        "end": end,
+        "cube": "hit" if hit else "build",
+    }
+    # the slice's own query, not the grouping-set build that produced it
+    return df, {"sql": render_kpi_sql(kpi, dims), "meta": meta}
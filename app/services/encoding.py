@@ -0,0 +1,100 @@
+from __future__ import annotations
+import gzip, json
+from typing import Any, Dict, List, Mapping, Optional, Tuple
+from fastapi import Request, Response
+from app.core.config import settings
+
+JSON = "application/json"
+MSGPACK = "application/x-msgpack"
+ARROW = "application/vnd.apache.arrow.stream"
+ARROW_META_KEY = b"insightminer"   # non-series fields ride in the Arrow schema metadata
+
+def _available(media_type: str) -> bool:
+    try:
+        if media_type == MSGPACK:
+            import msgpack  # noqa: F401
+        elif media_type == ARROW:
+            import pyarrow  # noqa: F401
+    except ImportError:
+        return False
+    return True
+
+def _parse_accept(header: Optional[str]) -> List[Tuple[str, float]]:
+    out = []
+    for part in (header or "").split(","):
+        bits = [b.strip() for b in part.split(";")]
+        if not bits[0]:
+            continue
+        q = 1.0
+        for b in bits[1:]:
+            if b.startswith("q="):
+                try:
+                    q = float(b[2:])
+                except ValueError:
+                    q = 0.0
+        out.append((bits[0].lower(), q))
+    return sorted(out, key=lambda t: -t[1])
+
+def negotiate(accept: Optional[str]) -> str:
+    for media_type, q in _parse_accept(accept):
+        if q > 0 and media_type in (ARROW, MSGPACK) and _available(media_type):
+            return media_type
+    return JSON
+
+def _columnar(series: List[Dict[str, Any]]) -> Dict[str, List[Any]]:
+    return {
+        "period": [s["period"] for s in series],
+        "value": [s["value"] for s in series],
+        "dimension": [s.get("dimension") for s in series],
+    }
+
+def _encode(payload: Dict[str, Any], media_type: str) -> bytes:
+    if media_type == MSGPACK:
+        import msgpack
+        chart = dict(payload["chart"], series=_columnar(payload["chart"]["series"]),
+                     series_format="columnar")
+        return msgpack.packb(dict(payload, chart=chart), use_bin_type=True, default=str)
+    if media_type == ARROW:
+        import pyarrow as pa
+        table = pa.table(_columnar(payload["chart"]["series"]),
+                         schema=pa.schema([("period", pa.string()), ("value", pa.float64()),
+                                           ("dimension", pa.string())]))
+        rest = dict(payload, chart={k: v for k, v in payload["chart"].items() if k != "series"})
+        table = table.replace_schema_metadata({ARROW_META_KEY: json.dumps(rest, default=str)})
+        sink = pa.BufferOutputStream()
+        with pa.ipc.new_stream(sink, table.schema) as writer:
+            writer.write_table(table)
+        return sink.getvalue().to_pybytes()
+    return json.dumps(payload, default=str, separators=(",", ":")).encode("utf-8")
+
+def _compress(body: bytes, accept_encoding: str) -> Tuple[bytes, Optional[str]]:
+    if len(body) < settings.RESPONSE_COMPRESS_MIN_BYTES:
+        return body, None
+    encodings = {e.split(";")[0].strip().lower() for e in accept_encoding.split(",")}
+    if "br" in encodings:
+        try:
+            import brotli
+            return brotli.compress(body, quality=5), "br"
+        except ImportError:
+            pass
+    if "gzip" in encodings:
+        return gzip.compress(body, compresslevel=6), "gzip"
+    return body, None
+
+def encode_response(payload: Dict[str, Any], request: Request,
+                    headers: Optional[Mapping[str, str]] = None) -> Response:
+    """
+    Serialize an ask payload per the Accept header (JSON, MessagePack or Arrow IPC
+    for the chart series) and compress it per Accept-Encoding above a size threshold.
+    """
+    media_type = negotiate(request.headers.get("accept"))
+    body, content_encoding = _compress(_encode(payload, media_type),
+                                       request.headers.get("accept-encoding", ""))
+    out = Response(content=body, media_type=media_type)
+    out.headers["Vary"] = "Accept, Accept-Encoding"
+    if content_encoding:
+        out.headers["Content-Encoding"] = content_encoding
+    for k, v in (headers or {}).items():
+        if k.lower().startswith("x-"):
+            out.headers[k] = v
+    return out
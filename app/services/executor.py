@@ -1,16 +1,122 @@
 from __future__ import annotations
+import os, threading
+from typing import Any, Dict
+from concurrent.futures import ThreadPoolExecutor, CancelledError
 import pandas as pd
 from sqlalchemy import create_engine
 from app.core.config import settings  # or wherever your DB URL lives
+from app.services.sql_safety import authorize
+from app.services.singleflight import SingleFlight
+from app.services.admission import SQL_GATE, PRIORITY_REGISTRY, PRIORITY_LLM_SQL
+from app.services import partitions
 
-_engine = create_engine(settings.DATABASE_URL, future=True)
+_engine = None
+_ENGINE_LOCK = threading.Lock()
+_POOL = ThreadPoolExecutor(max_workers=4, thread_name_prefix="sql-spec")
+# identical queries in flight at the same time run once
+_FLIGHT = SingleFlight("sql", clone=lambda df: df.copy())
 
-def run_sql(sql: str) -> pd.DataFrame:
-    with _engine.connect() as con:
+def get_engine():
+    """Create the SQLAlchemy engine on first use (or during app startup warm-up)."""
+    global _engine
+    if _engine is None:
+        with _ENGINE_LOCK:
+            if _engine is None:
+                _engine = create_engine(settings.DATABASE_URL, future=True)
+    return _engine
+
+def _read_sql(sql: str) -> pd.DataFrame:
+    with SQL_GATE.slot(PRIORITY_REGISTRY), get_engine().connect() as con:
         return pd.read_sql(sql, con)
 
-def run_sql_explain(sql: str) -> None:
-    """Raise if SQLite can't parse/plan the query."""
-    explain = f"EXPLAIN QUERY PLAN {sql}"
-    with _engine.connect() as con:
-        _ = con.exec_driver_sql(explain).fetchall()
+def run_sql(sql: str) -> pd.DataFrame:
+    return _FLIGHT.do(("sql", sql), _read_sql, sql)
+
+def run_sql_guarded(sql: str, params: Dict[str, Any]) -> pd.DataFrame:
+    """
+    Prepare and run untrusted SQL on a pooled connection in one step.
+    The allowlist authorizer is active while SQLite prepares the statement, so a
+    query touching anything outside ALLOWLIST (or failing to parse) raises
+    sqlite3.Error before a single row is read. Parameters are bound natively.
+    Partition pruning is not applied: generated SQL gets no benefit of the doubt.
+    """
+    key = ("guarded", sql, tuple(sorted(params.items())))
+    return _FLIGHT.do(key, _run_guarded, sql, params)
+
+def _run_guarded(sql: str, params: Dict[str, Any]) -> pd.DataFrame:
+    with SQL_GATE.slot(PRIORITY_LLM_SQL):
+        raw = get_engine().raw_connection()
+        try:
+            con = raw.driver_connection
+            con.set_authorizer(authorize)
+            try:
+                cur = con.execute(sql.strip().rstrip(";"), params)
+                rows = cur.fetchall()
+                cols = [d[0] for d in cur.description]
+            finally:
+                con.set_authorizer(None)
+        finally:
+            raw.close()
+    return pd.DataFrame.from_records(rows, columns=cols)
+
+def data_version() -> str:
+    """Cheap fingerprint that changes whenever the SQLite file (or its WAL) is written."""
+    path = get_engine().url.database or ""
+    parts = []
+    for p in (path, f"{path}-wal"):
+        try:
+            st = os.stat(p)
+            parts.append(f"{st.st_mtime_ns}:{st.st_size}")
+        except OSError:
+            parts.append("-")
+    return "|".join(parts)
+
+def prune_partitions(sql: str, start: str, end: str) -> str:
+    """
+    Narrow partitioned fact tables to the [start, end] window where the SQL binds their
+    partition key to it (no-op if unpartitioned). Meant for registry SQL.
+    """
+    if not settings.PARTITION_PRUNING:
+        return sql
+    with get_engine().connect() as con:
+        catalog = partitions.load_catalog(con.connection.driver_connection, data_version())
+    return partitions.prune(sql, start, end, catalog)
+
+def bind_dates(sql: str, start: str, end: str) -> str:
+    return sql.replace(":start", f"'{start}'").replace(":end", f"'{end}'")
+
+class SqlJob:
+    """
+    A query started in the background. cancel() drops it if it is still queued
+    and interrupts SQLite if it is already running.
+    """
+
+    def __init__(self, sql: str):
+        self._lock = threading.Lock()
+        self._dbapi = None
+        self._cancelled = False
+        self.future = _POOL.submit(self._run, sql)
+
+    def _run(self, sql: str) -> pd.DataFrame:
+        with SQL_GATE.slot(PRIORITY_REGISTRY):
+            raw = get_engine().raw_connection()
+            try:
+                with self._lock:
+                    if self._cancelled:
+                        raise CancelledError()
+                    self._dbapi = raw.driver_connection
+                return pd.read_sql(sql, self._dbapi)
+            finally:
+                with self._lock:
+                    self._dbapi = None
+                raw.close()
+
+    def result(self, timeout: float | None = None) -> pd.DataFrame:
+        return self.future.result(timeout=timeout)
+
+    def cancel(self) -> None:
+        with self._lock:
+            self._cancelled = True
+            if self._dbapi is not None:
+                self._dbapi.interrupt()
+        self.future.cancel()
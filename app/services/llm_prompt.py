@@ -1,48 +1,19 @@
 from __future__ import annotations
-from typing import Dict, Any, List
+import hashlib, json, logging
+from functools import lru_cache
+from typing import Dict, Any, List, Optional, Tuple
 from pathlib import Path
 import yaml
+from app.core.config import settings
+from app.services.sql_safety import ALLOWLIST
 
-# Builds a compact prompt including KPI glossary and schema columns
-def build_prompt(question: str, kpis_yaml: Path, dims: List[str] | None) -> str:
-    spec = yaml.safe_load(kpis_yaml.read_text(encoding="utf-8"))
-    kpi_lines = []
-    for k in spec.get("kpis", []):
-        kpi_lines.append(f"- {k['key']}: {k.get('name')} | unit={k.get('unit')} | dims={k.get('allow_dimensions',[])}")
-    dim_lines = []
-    for d in spec.get("dimensions", []):
-        dim_lines.append(f"- {d['name']}: column={d['column']} alias={d.get('alias', d['name'])}")
-
-    schema = {
-        "accounts": ["account_id","account_name","industry","country","signup_date","referral_source","plan_tier","seats","is_trial","churn_flag"],
-        "subscriptions": ["subscription_id","account_id","start_date","end_date","plan_tier","seats","mrr_amount","arr_amount","is_trial","upgrade_flag","downgrade_flag","churn_flag","billing_frequency","auto_renew_flag"],
-        "feature_usage": ["usage_id","subscription_id","usage_date","feature_name","usage_count","usage_duration_secs","error_count","is_beta_feature"],
-        "support_tickets": ["ticket_id","account_id","submitted_at","closed_at","resolution_time_hours","priority","first_response_time_minutes","satisfaction_score","escalation_flag"],
-        "churn_events": ["churn_event_id","account_id","churn_date","reason_code","refund_amount_usd","preceding_upgrade_flag","preceding_downgrade_flag","is_reactivation","feedback_text"],
-    }
+log = logging.getLogger(__name__)
 
-    fewshots = [
-        {
-            "q": "Compare revenue by region in 2024",
-            "intent": {"kpi": "revenue_net", "dims": ["region"], "start": "2024-01-01", "end": "2024-12-31"},
-        },
-        {
-            "q": "Show churn rate by month for 2024",
-            "intent": {"kpi": "churn_rate", "dims": [], "start": "2024-01-01", "end": "2024-12-31"},
-        },
-        {
-            "q": "Average ticket resolution time by region, 2024",
-            "intent": {"kpi": "avg_resolution_time", "dims": ["region"], "start": "2024-01-01", "end": "2024-12-31"},
-        },
-        {
-            "q": "Feature adoption by plan tier for 2024",
-            "intent": {"kpi": "feature_adoption", "dims": ["plan_tier"], "start": "2024-01-01", "end": "2024-12-31"},
-        },
-    ]
+# The prompt is laid out as a byte-stable static prefix (rules, glossary, schema,
+# few-shots) followed by the per-request part, so provider-side prompt caching
+# can reuse the prefix. The prefix only changes when the registry file does.
 
-    dims_txt = ", ".join(dims or [])
-    prompt = f"""
-You are a careful analytics planner. Map a user question to a KPI + dimensions + a single safe SQLite SQL query.
+RULES = """You are a careful analytics planner. Map a user question to a KPI + dimensions + a single safe SQLite SQL query.
 
 Constraints:
 - Use only SELECT/CTE.
@@ -50,22 +21,116 @@ Constraints:
 - Use only allowed tables/columns listed below.
 - Include named placeholders :start and :end when time-bounding.
 - If a dimension is requested, include it as a column and GROUP BY it.
-- Return STRICT JSON with keys: kpi, dims (array), sql (string). Nothing else.
+- Return STRICT JSON with keys: kpi, dims (array), sql (string). Nothing else."""
 
-Available KPIs:
-{chr(10).join(kpi_lines)}
+FEWSHOTS: List[Dict[str, Any]] = [
+    {
+        "q": "Compare revenue by region in 2024",
+        "intent": {"kpi": "revenue_net", "dims": ["region"], "start": "2024-01-01", "end": "2024-12-31"},
+    },
+    {
+        "q": "Show churn rate by month for 2024",
+        "intent": {"kpi": "churn_rate", "dims": [], "start": "2024-01-01", "end": "2024-12-31"},
+    },
+    {
+        "q": "Average ticket resolution time by region, 2024",
+        "intent": {"kpi": "avg_resolution_time", "dims": ["region"], "start": "2024-01-01", "end": "2024-12-31"},
+    },
+    {
+        "q": "Feature adoption by plan tier for 2024",
+        "intent": {"kpi": "feature_adoption", "dims": ["plan_tier"], "start": "2024-01-01", "end": "2024-12-31"},
+    },
+]
 
-Available dimensions:
-{chr(10).join(dim_lines)}
+# ---------- Token accounting ----------
+def count_tokens(text: str) -> int:
+    """Local token count (tiktoken if installed, else ~4 chars/token)."""
+    try:
+        import tiktoken
+        try:
+            enc = tiktoken.encoding_for_model(settings.LLM_MODEL)
+        except KeyError:
+            enc = tiktoken.get_encoding("o200k_base")
+        return len(enc.encode(text))
+    except Exception:
+        # not installed, or the encoding can't be downloaded (offline / blocked network)
+        return (len(text) + 3) // 4
 
-Schema (allowlisted):
-{schema}
+def estimate_cost(prompt_tokens: int, completion_tokens: int, cached_tokens: int = 0) -> float:
+    """USD, from the per-1M-token prices in settings."""
+    fresh = max(prompt_tokens - cached_tokens, 0)
+    return (fresh * settings.LLM_PRICE_INPUT_PER_1M
+            + cached_tokens * settings.LLM_PRICE_CACHED_INPUT_PER_1M
+            + completion_tokens * settings.LLM_PRICE_OUTPUT_PER_1M) / 1_000_000
 
-Few-shot intents (examples):
-{fewshots}
+def log_llm_usage(component: str, prompt: str, resp: Any, prefix_version: Optional[str] = None) -> None:
+    usage = getattr(resp, "usage", None)
+    prompt_tokens = getattr(usage, "prompt_tokens", None) or count_tokens(prompt)
+    completion_tokens = getattr(usage, "completion_tokens", None) or 0
+    details = getattr(usage, "prompt_tokens_details", None)
+    cached_tokens = getattr(details, "cached_tokens", None) or 0
+    log.info("llm_usage component=%s model=%s prefix_version=%s prompt_tokens=%d cached_tokens=%d "
+             "completion_tokens=%d est_cost_usd=%.6f",
+             component, getattr(resp, "model", None) or settings.LLM_MODEL, prefix_version or "-",
+             prompt_tokens, cached_tokens, completion_tokens,
+             estimate_cost(prompt_tokens, completion_tokens, cached_tokens))
 
-User question: {question}
-User-chosen dimensions (optional): {dims_txt or "[]"}
-Respond with JSON: {{"kpi":"...", "dims": ["..."], "sql":"..."}}
-"""
-    return prompt.strip()
+# ---------- Static prefix ----------
+def _render_schema() -> str:
+    return "\n".join(f"{t}({','.join(cols)})" for t, cols in ALLOWLIST.items())
+
+def _render_fewshots(shots: List[Dict[str, Any]]) -> str:
+    return "\n".join(f"Q: {s['q']} => {json.dumps(s['intent'], separators=(',', ':'))}" for s in shots)
+
+def _assemble(kpi_lines: List[str], dim_lines: List[str], shots: List[Dict[str, Any]]) -> str:
+    parts = [
+        RULES,
+        "Available KPIs:\n" + "\n".join(kpi_lines),
+        "Available dimensions:\n" + "\n".join(dim_lines),
+        "Schema (allowlisted):\n" + _render_schema(),
+    ]
+    if shots:
+        parts.append("Few-shot intents (examples):\n" + _render_fewshots(shots))
+    return "\n\n".join(parts)
+
+@lru_cache(maxsize=8)
+def _static_prefix(path: str, mtime_ns: int, budget: int) -> Tuple[str, str]:
+    spec = yaml.safe_load(Path(path).read_text(encoding="utf-8"))
+    kpis = spec.get("kpis", [])
+    full = [f"- {k['key']}: {k.get('name')} | unit={k.get('unit')} | dims={','.join(k.get('allow_dimensions', []))}"
+            for k in kpis]
+    short = [f"- {k['key']}: {k.get('name')}" for k in kpis]
+    dim_lines = [f"- {d['name']}: column={d['column']} alias={d.get('alias', d['name'])}"
+                 for d in spec.get("dimensions", [])]
+
+    # trim order: few-shots first (least essential), then glossary detail
+    shots = list(FEWSHOTS)
+    text = _assemble(full, dim_lines, shots)
+    while shots and count_tokens(text) > budget:
+        shots.pop()
+        text = _assemble(full, dim_lines, shots)
+    if count_tokens(text) > budget:
+        text = _assemble(short, dim_lines, shots)
+    tokens = count_tokens(text)
+    if tokens > budget:
+        log.warning("prompt_prefix over budget tokens=%d budget=%d", tokens, budget)
+    version = hashlib.sha256(text.encode("utf-8")).hexdigest()[:12]
+    log.info("prompt_prefix version=%s tokens=%d fewshots=%d", version, tokens, len(shots))
+    return text, version
+
+def static_prefix(kpis_yaml: Path) -> Tuple[str, str]:
+    """(prefix text, version hash); recomputed only when the registry file changes."""
+    p = kpis_yaml.resolve()
+    return _static_prefix(str(p), p.stat().st_mtime_ns, settings.LLM_PROMPT_TOKEN_BUDGET)
+
+# Builds a compact prompt including KPI glossary and schema columns
+def build_prompt(question: str, kpis_yaml: Path, dims: List[str] | None) -> Tuple[str, str]:
+    """(prompt, static prefix version); log the version with the call's usage."""
+    prefix, version = static_prefix(kpis_yaml)
+    dims_txt = ", ".join(dims or [])
+    return (
+        f"{prefix}\n\n"
+        f"User question: {question}\n"
+        f"User-chosen dimensions (optional): {dims_txt or '[]'}\n"
+        'Respond with JSON: {"kpi":"...", "dims": ["..."], "sql":"..."}'
+    ), version
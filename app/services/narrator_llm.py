@@ -1,8 +1,25 @@
 from __future__ import annotations
-import os, json
-from typing import List, Dict, Any, Optional
+import os, json, hashlib, logging, threading
+from concurrent.futures import ThreadPoolExecutor, TimeoutError as FutureTimeout
+from typing import Callable, List, Dict, Any, Optional, Tuple
 import pandas as pd
 from app.core.config import settings
+from app.services.cache import get_cache
+from app.services.llm_prompt import log_llm_usage
+from app.services.singleflight import SingleFlight
+from app.services.admission import LLM_GATE, PRIORITY_NARRATOR
+from app.services.circuit_breaker import OPENAI_BREAKER
+
+log = logging.getLogger(__name__)
+
+# LLM narrations run here so "hedged" mode can stop waiting without killing the call.
+# Sized like the LLM gate; _SLOTS caps queued + running work so late calls can't pile up.
+_POOL = ThreadPoolExecutor(max_workers=settings.LLM_MAX_CONCURRENCY, thread_name_prefix="narrator-llm")
+_SLOTS = threading.BoundedSemaphore(settings.LLM_MAX_CONCURRENCY)
+# keyed by prompt hash; late hedged results land here for the next identical request
+_CACHE = get_cache("narration", maxsize=256, ttl=3600)
+# identical prompts in flight at once make a single OpenAI call
+_FLIGHT = SingleFlight("narration", clone=lambda b: list(b) if b else b)
 
 def _build_stats_block(stats: Dict[str, Any]) -> str:
     unit = stats.get("unit") or ""
@@ -59,22 +76,34 @@ def _call_openai(prompt: str) -> Optional[str]:
     try:
         import openai  # openai>=1.0
         client = openai.OpenAI(api_key=key)
-        resp = client.chat.completions.create(
-            model=settings.LLM_MODEL,
-            messages=[{"role":"user","content":prompt}],
-            temperature=0.2,
-            max_tokens=settings.LLM_MAX_TOKENS,
-            timeout=settings.LLM_TIMEOUT,
-        )
+        with LLM_GATE.slot(PRIORITY_NARRATOR), OPENAI_BREAKER.guard():
+            resp = client.chat.completions.create(
+                model=settings.LLM_MODEL,
+                messages=[{"role":"user","content":prompt}],
+                temperature=0.2,
+                max_tokens=settings.LLM_MAX_TOKENS,
+                timeout=settings.LLM_TIMEOUT,
+            )
+        log_llm_usage("narrator", prompt, resp)
         return resp.choices[0].message.content
     except Exception:
         return None
 
-def narrate_with_llm(stats: Dict[str, Any], df: pd.DataFrame) -> Optional[List[str]]:
+def _prompt(stats: Dict[str, Any], df: pd.DataFrame) -> Tuple[str, str]:
     prompt = PROMPT_TMPL.format(
         stats_block=_build_stats_block(stats),
         table_block=_slice_table(df),
     )
+    return hashlib.sha256(prompt.encode("utf-8")).hexdigest(), prompt
+
+def narrate_with_llm(stats: Dict[str, Any], df: pd.DataFrame) -> Optional[List[str]]:
+    key, prompt = _prompt(stats, df)
+    cached = _CACHE.get(key)
+    if cached is not None:
+        return list(cached)
+    return _FLIGHT.do(key, _narrate, key, prompt)
+
+def _narrate(key: str, prompt: str) -> Optional[List[str]]:
     text = _call_openai(prompt)
     if not text:
         return None
@@ -82,4 +111,47 @@ def narrate_with_llm(stats: Dict[str, Any], df: pd.DataFrame) -> Optional[List[s
     lines = [ln.strip() for ln in text.splitlines() if ln.strip().startswith("- ")]
     # minimal cleanup
     bullets = [ln[2:].strip() for ln in lines][:3]
+    if bullets:
+        _CACHE.set(key, bullets)
     return bullets or None
+
+def narrate_with_deadline(stats: Dict[str, Any], df: pd.DataFrame,
+                          fallback: Callable[[Dict[str, Any]], List[str]],
+                          deadline: float) -> Tuple[List[str], str]:
+    """
+    Race the LLM narrator against a latency budget.
+    Returns (bullets, source) where source is "llm", "deadline" (budget expired,
+    deterministic bullets used), "fallback" (LLM answered without bullets) or
+    "busy" (every narrator slot taken; nothing submitted).
+    A call that misses the deadline keeps running and fills the cache.
+    """
+    if not _SLOTS.acquire(blocking=False):
+        cached = _CACHE.get(_prompt(stats, df)[0])
+        if cached is not None:
+            return list(cached), "llm"
+        log.info("insights=deterministic reason=narrator_busy")
+        return fallback(stats), "busy"
+
+    def run() -> Optional[List[str]]:
+        try:
+            return narrate_with_llm(stats, df)
+        finally:
+            _SLOTS.release()
+
+    try:
+        fut = _POOL.submit(run)
+    except BaseException:
+        _SLOTS.release()
+        raise
+    det = fallback(stats)  # computed while the LLM call is in flight
+    try:
+        bullets = fut.result(timeout=max(deadline, 0.0))
+    except FutureTimeout:
+        log.info("insights=deterministic reason=deadline deadline=%.2fs", deadline)
+        return det, "deadline"
+    except Exception as e:
+        log.warning("insights=deterministic reason=llm_error err=%s", e)
+        return det, "fallback"
+    if bullets:
+        return bullets, "llm"
+    return det, "fallback"
@@ -0,0 +1,130 @@
+from __future__ import annotations
+import logging, re, sqlite3
+from typing import Dict, List, Optional, Tuple
+from app.services.cache import TTLCache
+
+log = logging.getLogger(__name__)
+
+# base table -> partition key column; scripts/partitions.py builds the tables from this.
+PARTITIONED: Dict[str, str] = {
+    "feature_usage": "usage_date",
+    "support_tickets": "submitted_at",
+}
+PARTITION_NAME = re.compile(r"^(%s)_p(?:\d{4}q[1-4]|none)$" % "|".join(PARTITIONED))
+
+_CLAUSE_WORDS = ("on", "where", "join", "left", "right", "inner", "outer", "cross", "natural",
+                 "group", "order", "limit", "using", "union", "having", "window", "except", "intersect")
+
+# data_version -> {base: [(name, lo, hi)]}
+_CATALOG = TTLCache(maxsize=4, ttl=3600)
+
+Partition = Tuple[str, Optional[str], Optional[str]]
+
+def base_table(name: str) -> Optional[str]:
+    """'feature_usage_p2024q1' -> 'feature_usage'; None for non-partition names."""
+    m = PARTITION_NAME.match(name or "")
+    return m.group(1) if m else None
+
+def load_catalog(con: sqlite3.Connection, version: str) -> Dict[str, List[Partition]]:
+    cat = _CATALOG.get(version)
+    if cat is not None:
+        return cat
+    cat = {}
+    try:
+        for name, base, lo, hi in con.execute("SELECT name, base, lo, hi FROM _partitions ORDER BY lo"):
+            cat.setdefault(base, []).append((name, lo, hi))
+    except sqlite3.OperationalError:
+        pass   # unpartitioned database
+    _CATALOG.set(version, cat)
+    return cat
+
+def _month_start(d: str) -> str:
+    return d[:7] + "-01"
+
+_REF = r"\b(from|join)\s+{base}\b(\s+(?:as\s+)?([A-Za-z_]\w*))?"
+# WHERE / ON text up to the next clause; predicates are only trusted there
+_PREDICATES = re.compile(r"\b(?:where|on)\b(.*?)(?=\b(?:select|join|left|right|inner|cross|natural|group|"
+                         r"order|limit|having|window|union|except|intersect|where|on)\b|$)",
+                         re.IGNORECASE | re.DOTALL)
+_DISJUNCTION = re.compile(r"\bor\b|\bnot\s*\(", re.IGNORECASE)
+_CASE = re.compile(r"\bcase\b", re.IGNORECASE)
+
+def _qualifiers(sql: str, base: str) -> List[str]:
+    """The name each FROM/JOIN reference to `base` is addressed by (its alias, else `base`)."""
+    out = []
+    for m in re.finditer(_REF.format(base=base), sql, flags=re.IGNORECASE):
+        alias = m.group(3)
+        out.append(alias if alias and alias.lower() not in _CLAUSE_WORDS else base)
+    return out
+
+def _bounded(sql: str, col: str) -> bool:
+    """
+    True when a WHERE/ON clause bounds `col` by :start and :end directly, e.g.
+    `f.usage_date BETWEEN :start AND :end` or `f.usage_date >= :start AND f.usage_date < :end`.
+    Queries with OR or NOT (...) anywhere, and clauses with CASE, are not trusted.
+    """
+    if _DISJUNCTION.search(sql):
+        return False
+    col = rf"(?:date(?:time)?\(\s*{col}\s*\)|{col})"
+    lower = (rf"{col}\s*>=?\s*:start\b", rf":start\s*<=?\s*{col}")
+    upper = (rf"{col}\s*<=?\s*:end\b", rf":end\s*>=?\s*{col}")
+    for m in _PREDICATES.finditer(sql):
+        text = m.group(1)
+        if _CASE.search(text):
+            continue
+        if re.search(rf"(?<![\w.]){col}\s+between\s+:start\s+and\s+:end\b", text, re.IGNORECASE):
+            return True
+        if (any(re.search(rf"(?<![\w.]){p}", text, re.IGNORECASE) for p in lower)
+                and any(re.search(rf"(?<![\w.]){p}", text, re.IGNORECASE) for p in upper)):
+            return True
+    return False
+
+def prunable(sql: str, base: str) -> bool:
+    """
+    Whether every reference to `base` in `sql` has its partition key bound by
+    :start/:end, so rows outside the window cannot reach the result. Each
+    reference needs its own alias (or must be the query's only table) and a
+    predicate on `<alias>.<key>`; a filter on another table's date column or
+    inside an OR is not enough.
+    """
+    key = PARTITIONED[base]
+    quals = _qualifiers(sql, base)
+    if not quals:
+        return False
+    if len(set(q.lower() for q in quals)) != len(quals):
+        return False   # the same qualifier in several scopes; can't tell them apart
+    single = len(re.findall(r"\b(?:from|join)\b", sql, flags=re.IGNORECASE)) == 1
+    for q in quals:
+        cols = [rf"{re.escape(q)}\.{key}"] + ([rf"{key}\b"] if single else [])
+        if not any(_bounded(sql, c) for c in cols):
+            return False
+    return True
+
+def prune(sql: str, start: str, end: str, catalog: Dict[str, List[Partition]]) -> str:
+    """
+    Swap references to a partitioned view for a UNION ALL of only the partitions
+    overlapping [start-of-month(start), end]. Applied only to tables whose
+    partition key is bound by :start/:end (see prunable); otherwise rows outside
+    the window may matter and the view is left alone.
+    """
+    if ":start" not in sql or ":end" not in sql:
+        return sql
+    lo, hi = _month_start(start[:10]), end[:10]
+    for base, parts in catalog.items():
+        if not parts or base not in PARTITIONED or not prunable(sql, base):
+            continue
+        keep = [n for n, plo, phi in parts if plo is not None and plo <= hi and phi > lo]
+        if len(keep) == len(parts):
+            continue
+        body = " UNION ALL ".join(f"SELECT * FROM {n}" for n in keep) or f"SELECT * FROM {parts[0][0]} WHERE 0"
+
+        def _swap(m: re.Match) -> str:
+            tail, alias = m.group(2) or "", m.group(3)
+            if alias and alias.lower() not in _CLAUSE_WORDS:
+                return f"{m.group(1)} ({body}){tail}"
+            # no alias: keep the table name usable as a qualifier
+            return f"{m.group(1)} ({body}) AS {base}{tail}"
+
+        sql = re.sub(_REF.format(base=base), _swap, sql, flags=re.IGNORECASE)
+        log.info("partitions=pruned table=%s kept=%d of=%d", base, len(keep), len(parts))
+    return sql
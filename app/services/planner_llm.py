@@ -1,11 +1,19 @@
 from __future__ import annotations
-import json, os, logging
-from typing import Any, Dict, List, Optional
+import json, os, logging, sqlite3, hashlib, copy
+from typing import Any, Dict, List, Optional, Tuple
 from pathlib import Path
+import pandas as pd
+from app.core.config import settings
 from app.services.sql_safety import validate_sql
-from app.services.llm_prompt import build_prompt
+from app.services.llm_prompt import build_prompt, log_llm_usage
 from app.services.planner_registry import plan_from_registry, REG_PATH
-from app.services.executor import run_sql_explain
+from app.services.executor import run_sql_guarded, bind_dates, prune_partitions, SqlJob
+from app.services.range_cache import run_registry_sql
+from app.services.trend_sql import summarize
+from app.services.cache import get_cache
+from app.services.singleflight import SingleFlight
+from app.services.admission import LLM_GATE, PRIORITY_PLANNER, Overloaded
+from app.services.circuit_breaker import OPENAI_BREAKER, CircuitOpen
 
 log = logging.getLogger(__name__)
 
@@ -14,21 +22,35 @@ MODEL = os.getenv("LLM_MODEL", "gpt-4o-mini")
 TIMEOUT = int(os.getenv("LLM_TIMEOUT", "12"))
 MAX_TOKENS = int(os.getenv("LLM_MAX_TOKENS", "600"))
 
-def _call_llm(prompt: str) -> Optional[str]:
+# raw LLM plans keyed by (model, prompt); only plans that pass validation are stored
+_PLAN_CACHE = get_cache("plan", maxsize=512, ttl=3600)
+# concurrent identical questions share one LLM planning call
+_FLIGHT = SingleFlight("plan", clone=copy.deepcopy)
+
+def _call_llm(prompt: str, prefix_version: Optional[str] = None) -> Optional[str]:
     if not OPENAI_API_KEY:
         log.info("planner=registry reason=no_api_key")
         return None
     try:
         import openai  # openai>=1.0.0
         client = openai.OpenAI(api_key=OPENAI_API_KEY)
-        resp = client.chat.completions.create(
-            model=MODEL,
-            messages=[{"role":"user","content":prompt}],
-            temperature=0.2,
-            max_tokens=MAX_TOKENS,
-            timeout=TIMEOUT,
-        )
+        # queue for the gate first: only the upstream call itself counts against the breaker
+        with LLM_GATE.slot(PRIORITY_PLANNER), OPENAI_BREAKER.guard():
+            resp = client.chat.completions.create(
+                model=MODEL,
+                messages=[{"role":"user","content":prompt}],
+                temperature=0.2,
+                max_tokens=MAX_TOKENS,
+                timeout=TIMEOUT,
+            )
+        log_llm_usage("planner", prompt, resp, prefix_version)
         return resp.choices[0].message.content
+    except CircuitOpen:
+        log.info("planner=registry reason=circuit_open")
+        return None
+    except Overloaded as e:
+        log.info("planner=registry reason=llm_gate_%s", e.reason)
+        return None
     except Exception as e:
         log.warning("planner=registry reason=llm_call_failed err=%s", e)
         return None
@@ -42,13 +64,22 @@ def _fallback(question: str, start: str, end: str, dims: Optional[List[str]]):
     return plan
 
 def plan_with_llm(question: str, start: str, end: str, dims: Optional[List[str]]):
+    """
+    LLM plans are only text-checked here; they are prepared under the allowlist
+    authorizer when executed (see _execute_llm_plan).
+    """
+    key = (" ".join(question.lower().split()), start, end, tuple(dims or []))
+    return _FLIGHT.do(key, _plan_with_llm, question, start, end, dims)
+
+def _plan_with_llm(question: str, start: str, end: str, dims: Optional[List[str]]):
     try:
-        prompt = build_prompt(question, Path(REG_PATH), dims or [])
+        prompt, prefix_version = build_prompt(question, Path(REG_PATH), dims or [])
     except Exception as e:
         log.warning("planner=registry reason=prompt_build_failed err=%s", e)
         return _fallback(question, start, end, dims)
 
-    raw = _call_llm(prompt)
+    cache_key = hashlib.sha256(f"{MODEL}\n{prompt}".encode("utf-8")).hexdigest()
+    raw = _PLAN_CACHE.get(cache_key) or _call_llm(prompt, prefix_version)
     if not raw:
         return _fallback(question, start, end, dims)
 
@@ -68,13 +99,7 @@ def plan_with_llm(question: str, start: str, end: str, dims: Optional[List[str]]
         log.warning("planner=registry reason=unsafe_sql msg=%s", msg)
         return _fallback(question, start, end, dims)
 
-    # EXPLAIN gate (parse only)
-    try:
-        run_sql_explain(sql.replace(":start", f"'{start}'").replace(":end", f"'{end}'"))
-    except Exception as e:
-        log.warning("planner=registry reason=explain_failed err=%s", e)
-        return _fallback(question, start, end, dims)
-
+    _PLAN_CACHE.set(cache_key, raw)
     log.info("planner=llm question=%s", question)
     meta = {
         "kpi": kpi,
@@ -84,3 +109,76 @@ def plan_with_llm(question: str, start: str, end: str, dims: Optional[List[str]]
         "planner": "llm",
     }
     return {"sql": sql, "meta": meta}
+
+
+def _execute_llm_plan(plan: Dict[str, Any], question: str, start: str, end: str,
+                      dims: Optional[List[str]]) -> Tuple[Dict[str, Any], pd.DataFrame]:
+    try:
+        return plan, run_sql_guarded(plan["sql"], {"start": start, "end": end})
+    except sqlite3.Error as e:
+        log.warning("planner=registry reason=sql_rejected err=%s", e)
+    reg = _fallback(question, start, end, dims)
+    return reg, run_registry_sql(reg["sql"], start, end, reg["meta"].get("month_local", False))
+
+def _execute(plan: Dict[str, Any], question: str, start: str, end: str,
+             dims: Optional[List[str]]) -> Tuple[Dict[str, Any], pd.DataFrame]:
+    if plan["meta"].get("planner") == "llm":
+        return _execute_llm_plan(plan, question, start, end, dims)
+    return plan, run_registry_sql(plan["sql"], start, end, plan["meta"].get("month_local", False))
+
+# ---------- Speculative execution ----------
+def _same_intent(llm_meta: Dict[str, Any], reg_meta: Dict[str, Any]) -> bool:
+    return (llm_meta.get("kpi") == reg_meta.get("kpi")
+            and (llm_meta.get("dimension") or None) == (reg_meta.get("dimension") or None))
+
+def _plan_speculative(question: str, start: str, end: str,
+                      dims: Optional[List[str]]) -> Tuple[Dict[str, Any], pd.DataFrame]:
+    # registry planning is cheap; start its SQL while the LLM is thinking
+    reg = _fallback(question, start, end, dims)
+    job = SqlJob(bind_dates(prune_partitions(reg["sql"], start, end), start, end))
+    try:
+        plan = plan_with_llm(question, start, end, dims)
+    except Exception:
+        job.cancel()
+        raise
+
+    if plan["meta"].get("planner") == "registry" or _same_intent(plan["meta"], reg["meta"]):
+        log.info("planner=registry speculative=hit kpi=%s", reg["meta"].get("kpi"))
+        reg["meta"]["speculative"] = "hit"
+        return reg, job.result()
+
+    log.info("planner=llm speculative=miss kpi=%s", plan["meta"].get("kpi"))
+    job.cancel()
+    plan["meta"]["speculative"] = "miss"
+    return _execute_llm_plan(plan, question, start, end, dims)
+
+def plan_and_execute(question: str, start: str, end: str,
+                     dims: Optional[List[str]]) -> Tuple[Dict[str, Any], pd.DataFrame]:
+    """Plan with the LLM (or registry fallback) and run the resulting SQL."""
+    if (settings.KPI_PLANNER_MODE or "auto").lower() == "speculative":
+        return _plan_speculative(question, start, end, dims)
+    plan = plan_with_llm(question, start, end, dims)
+    if not plan or "sql" not in plan or "meta" not in plan:
+        raise ValueError("Planner returned no plan")
+    return _execute(plan, question, start, end, dims)
+
+def plan_and_summarize(question: str, start: str, end: str, dims: Optional[List[str]],
+                       top_n: Optional[int], top_k: int = 0
+                       ) -> Tuple[Dict[str, Any], pd.DataFrame, Optional[Dict[str, Any]]]:
+    """
+    Like plan_and_execute, but grouped registry plans get their trend stats computed
+    in SQLite (trend_sql.summarize) and return only the chart series. Ungrouped
+    plans, LLM SQL (no fixed column shape) and speculative mode return stats None
+    and the caller computes them from the full frame.
+    """
+    if (settings.KPI_PLANNER_MODE or "auto").lower() == "speculative":
+        plan, df = _plan_speculative(question, start, end, dims)
+        return plan, df, None
+    plan = plan_with_llm(question, start, end, dims)
+    if not plan or "sql" not in plan or "meta" not in plan:
+        raise ValueError("Planner returned no plan")
+    if plan["meta"].get("planner") == "llm":
+        plan, df = _execute_llm_plan(plan, question, start, end, dims)
+        return plan, df, None
+    stats, df = summarize(plan["sql"], start, end, plan["meta"], top_n, top_k)
+    return plan, df, stats
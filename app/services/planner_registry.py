@@ -1,12 +1,12 @@
 from __future__ import annotations
-import yaml, re
+import os, re, threading
 from dataclasses import dataclass
-from jinja2 import Template
 from pathlib import Path
 from typing import Dict, Any, Optional, List
 
 # ---------- Load registry ----------
-REG_PATH = Path("app/data/kpis.yaml")
+# resolved from this file, not the CWD, so the API can start from any directory
+REG_PATH = Path(os.getenv("KPI_REGISTRY_PATH", Path(__file__).resolve().parents[1] / "data" / "kpis.yaml"))
 
 @dataclass
 class DimensionDef:
@@ -24,9 +24,12 @@ class KpiDef:
     sql: str
     synonyms: List[str]
     allow_dimensions: List[str]
+    additive: bool = False   # values can be summed across dimension members; opt-in via `additive: true`
+    month_local: bool = False   # a month's value depends only on that month's rows (range reuse)
 
 class Registry:
     def __init__(self, path: Path):
+        import yaml
         raw = yaml.safe_load(path.read_text(encoding="utf-8"))
         self.defaults = raw.get("defaults", {})
         self.dimensions: Dict[str, DimensionDef] = {}
@@ -40,13 +43,32 @@ class Registry:
             self.kpis[k["key"]] = KpiDef(
                 key=k["key"], name=k["name"], description=k.get("description",""),
                 unit=k.get("unit",""), sql=k["sql"], synonyms=k.get("synonyms",[]),
-                allow_dimensions=k.get("allow_dimensions", [])
+                allow_dimensions=k.get("allow_dimensions", []),
+                additive=bool(k.get("additive", False)),
+                month_local=bool(k.get("month_local", False)),
             )
 
-REG = Registry(REG_PATH)
+_REG: Optional[Registry] = None
+_REG_LOCK = threading.Lock()
+
+def get_registry() -> Registry:
+    """Parse the registry on first use (or during app startup warm-up)."""
+    global _REG
+    if _REG is None:
+        with _REG_LOCK:
+            if _REG is None:
+                _REG = Registry(REG_PATH)
+    return _REG
+
+def __getattr__(name: str):
+    # keep `planner_registry.REG` working without loading at import time
+    if name == "REG":
+        return get_registry()
+    raise AttributeError(name)
 
 # ---------- Intent resolution ----------
 def _find_kpi(question: str) -> KpiDef:
+    REG = get_registry()
     q = question.lower()
     # exact key or name match
     for k in REG.kpis.values():
@@ -60,6 +82,7 @@ def _find_kpi(question: str) -> KpiDef:
     return REG.kpis["revenue_net"]
 
 def _find_dimension(question: str, dims_param: Optional[List[str]], kpi: KpiDef) -> Optional[DimensionDef]:
+    REG = get_registry()
     # explicit param
     if dims_param:
         want = dims_param[0]
@@ -73,38 +96,41 @@ def _find_dimension(question: str, dims_param: Optional[List[str]], kpi: KpiDef)
     return None
 
 # ---------- Render SQL ----------
-def plan_from_registry(question: str, start: str, end: str,
-                       dims_param: Optional[List[str]] = None) -> Dict[str, Any]:
-    kpi = _find_kpi(question)
-    dim = _find_dimension(question, dims_param, kpi)
-
-    # Map base tables to aliases used in KPI SQLs
-    alias_map = {
-        "accounts.": "a.",
-        "subscriptions.": "subs.",
-        "feature_usage.": "f.",
-    }
+# Map base tables to aliases used in KPI SQLs
+ALIAS_MAP = {
+    "accounts.": "a.",
+    "subscriptions.": "subs.",
+    "feature_usage.": "f.",
+}
 
-    if dim:
+def render_kpi_sql(kpi: KpiDef, dims: List[DimensionDef]) -> str:
+    """Render a KPI template grouped by period plus each of `dims` (columns 3, 4, ...)."""
+    selects, groups = [], []
+    for i, dim in enumerate(dims):
         dim_col = dim.column
         # Swap base table prefixes to the aliases actually used in the KPI SQL
-        for base, alias in alias_map.items():
+        for base, alias in ALIAS_MAP.items():
             if dim_col.startswith(base):
                 dim_col = dim_col.replace(base, alias, 1)
                 break
-        dim_select = f", {dim_col} AS {dim.alias}"
-        dim_group  = ", 3"   # period=1, value=2, dimension=3
-    else:
-        dim_select = ""
-        dim_group  = ""
-
+        selects.append(f", {dim_col} AS {dim.alias}")
+        groups.append(f", {i + 3}")   # period=1, value=2, dimensions=3..
+    from jinja2 import Template
     tmpl = Template(kpi.sql)
-    sql = tmpl.render(dim_select=dim_select, dim_group=dim_group)
+    return tmpl.render(dim_select="".join(selects), dim_group="".join(groups))
+
+def plan_from_registry(question: str, start: str, end: str,
+                       dims_param: Optional[List[str]] = None) -> Dict[str, Any]:
+    kpi = _find_kpi(question)
+    dim = _find_dimension(question, dims_param, kpi)
+    sql = render_kpi_sql(kpi, [dim] if dim else [])
 
     meta = {
         "kpi": kpi.key,
         "unit": kpi.unit,
         "dimension": (dim.alias if dim else None),
+        "additive": kpi.additive,
+        "month_local": kpi.month_local,
         "start": start,
         "end": end,
     }
@@ -0,0 +1,103 @@
+from __future__ import annotations
+import hashlib, logging
+from dataclasses import dataclass
+from datetime import date, timedelta
+from typing import Callable, Dict, List, Optional, Tuple
+import pandas as pd
+from app.core.config import settings
+from app.services.cache import get_cache
+from app.services.executor import run_sql, bind_dates, prune_partitions, data_version
+
+log = logging.getLogger(__name__)
+
+# A month-local registry KPI (`month_local: true`) is bucketed by month and a month's
+# value only depends on the part of [start, end] that falls inside that month. So
+# results are stored per month, tagged with that coverage, and any later window
+# reuses the months it shares. Running totals, active-at-month-end counts and
+# distinct counts over the window are not month-local and always run whole.
+
+@dataclass
+class _Segment:
+    lo: date
+    hi: date
+    rows: pd.DataFrame
+
+# (query key, data_version) -> {month start: _Segment}
+_STORE = get_cache("range", maxsize=128, ttl=settings.RANGE_CACHE_TTL)
+
+def _month_start(d: date) -> date:
+    return d.replace(day=1)
+
+def _month_end(d: date) -> date:
+    return (d.replace(day=28) + timedelta(days=4)).replace(day=1) - timedelta(days=1)
+
+def _months(lo: date, hi: date) -> List[date]:
+    out, m = [], _month_start(lo)
+    while m <= hi:
+        out.append(m)
+        m = _month_end(m) + timedelta(days=1)
+    return out
+
+def _cover(m: date, lo: date, hi: date) -> Tuple[date, date]:
+    # a month that ends before the window does is bounded by the next month's first
+    # day: date columns hold 'YYYY-MM-DD HH:MM:SS', so `<= 'YYYY-MM-30'` would drop
+    # the last day that a direct query over the wider window includes
+    end = _month_end(m)
+    return max(lo, m), (hi if end >= hi else end + timedelta(days=1))
+
+def _runs(months: List[date]) -> List[List[date]]:
+    # group months into contiguous runs so each gap costs one query
+    runs: List[List[date]] = []
+    for m in months:
+        if runs and _month_end(runs[-1][-1]) + timedelta(days=1) == m:
+            runs[-1].append(m)
+        else:
+            runs.append([m])
+    return runs
+
+def _split(df: pd.DataFrame, months: List[date]) -> Optional[Dict[date, pd.DataFrame]]:
+    keys = pd.to_datetime(df.iloc[:, 0].astype(str), errors="coerce")
+    if keys.isna().any():
+        return None   # not a monthly series; can't be sliced safely
+    month_of = keys.dt.to_period("M").dt.start_time.dt.date
+    return {m: df[month_of == m] for m in months}
+
+def fetch_range(key: str, start: str, end: str,
+                fetch: Callable[[str, str], pd.DataFrame]) -> pd.DataFrame:
+    """
+    Return fetch(start, end), reusing cached months and only calling `fetch`
+    for the month runs the cache can't serve.
+    """
+    lo, hi = date.fromisoformat(start[:10]), date.fromisoformat(end[:10])
+    if lo > hi:
+        return fetch(start, end)
+    months = _months(lo, hi)
+    store_key = (key, data_version())
+    store: Dict[date, _Segment] = dict(_STORE.get(store_key) or {})
+
+    missing = [m for m in months
+               if m not in store or (store[m].lo, store[m].hi) != _cover(m, lo, hi)]
+    for run in _runs(missing):
+        s, e = _cover(run[0], lo, hi)[0], _cover(run[-1], lo, hi)[1]
+        df = fetch(s.isoformat(), e.isoformat())
+        parts = _split(df, run)
+        if parts is None:
+            log.info("range_cache=bypass reason=non_monthly key=%s", key[:12])
+            return fetch(start, end) if (s, e) != (lo, hi) else df
+        for m, rows in parts.items():
+            c_lo, c_hi = _cover(m, s, e)
+            store[m] = _Segment(lo=c_lo, hi=c_hi, rows=rows)
+
+    log.info("range_cache months=%d fetched=%d runs=%d", len(months), len(missing), len(_runs(missing)))
+    _STORE.set(store_key, store)
+    return pd.concat([store[m].rows for m in months], ignore_index=True)
+
+def run_registry_sql(sql: str, start: str, end: str, month_local: bool = False) -> pd.DataFrame:
+    """
+    Run a registry KPI query. With RANGE_REUSE on, month-local KPIs are served
+    from overlapping cached windows when possible; everything else runs as is.
+    """
+    if not (settings.RANGE_REUSE and month_local):
+        return run_sql(bind_dates(prune_partitions(sql, start, end), start, end))
+    key = hashlib.sha256(sql.encode("utf-8")).hexdigest()
+    return fetch_range(key, start, end, lambda s, e: run_sql(bind_dates(prune_partitions(sql, s, e), s, e)))
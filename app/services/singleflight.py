@@ -0,0 +1,62 @@
+from __future__ import annotations
+import logging, threading
+from typing import Any, Callable, Dict, Hashable, Optional
+
+log = logging.getLogger(__name__)
+
+class _Call:
+    __slots__ = ("done", "value", "error", "waiters")
+
+    def __init__(self):
+        self.done = threading.Event()
+        self.value: Any = None
+        self.error: Optional[BaseException] = None
+        self.waiters = 0
+
+class SingleFlight:
+    """
+    Coalesce concurrent identical work: the first caller for a key runs `fn`,
+    callers arriving while it is in flight block and receive the same result
+    (or the same exception). When a result was shared, `clone` is applied to
+    the value handed to every caller, leader included, so callers that mutate
+    their result don't step on each other.
+    """
+
+    def __init__(self, name: str, clone: Optional[Callable[[Any], Any]] = None):
+        self.name = name
+        self.clone = clone
+        self._calls: Dict[Hashable, _Call] = {}
+        self._lock = threading.Lock()
+
+    def do(self, key: Hashable, fn: Callable[..., Any], *args, **kwargs) -> Any:
+        with self._lock:
+            call = self._calls.get(key)
+            leader = call is None
+            if leader:
+                call = self._calls[key] = _Call()
+            else:
+                call.waiters += 1
+
+        if not leader:
+            call.done.wait()
+            if call.error is not None:
+                raise call.error
+            return self.clone(call.value) if self.clone else call.value
+
+        try:
+            call.value = fn(*args, **kwargs)
+        except BaseException as e:
+            call.error = e
+            raise
+        finally:
+            with self._lock:
+                del self._calls[key]
+            if call.waiters:
+                log.info("singleflight=%s coalesced=%d", self.name, call.waiters)
+            call.done.set()
+        # nobody mutates call.value itself: the leader gets a copy too when it was shared
+        return self.clone(call.value) if self.clone and call.waiters else call.value
+
+    def in_flight(self) -> int:
+        with self._lock:
+            return len(self._calls)
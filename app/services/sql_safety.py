@@ -1,5 +1,6 @@
-import re
-from typing import Dict, List, Tuple
+import re, sqlite3
+from app.services.partitions import base_table
+from typing import Dict, List, Optional, Tuple
 
 # Allowlist = the only tables/columns queries are allowed to reference
 ALLOWLIST: Dict[str, List[str]] = {
@@ -76,3 +77,22 @@ def validate_sql(sql: str) -> Tuple[bool, str]:
         return True, "ok"
     # If not present, still allow (some queries may not be time-bounded), but warn
     return True, "ok (no :start/:end placeholders found)"
+
+
+# ---------- SQLite authorizer ----------
+# Called by SQLite while it prepares a statement, once per table/column actually
+# read (CTE, subquery and view names never reach it), so this enforces ALLOWLIST exactly.
+_ALLOWED_ACTIONS = {sqlite3.SQLITE_SELECT, sqlite3.SQLITE_FUNCTION, sqlite3.SQLITE_RECURSIVE}
+
+def authorize(action: int, arg1: Optional[str], arg2: Optional[str],
+              db_name: Optional[str], trigger: Optional[str]) -> int:
+    if action in _ALLOWED_ACTIONS:
+        return sqlite3.SQLITE_OK
+    if action == sqlite3.SQLITE_READ and db_name in (None, "main"):
+        table = (arg1 or "").lower()
+        # partitions of feature_usage / support_tickets share their base table's allowlist
+        cols = ALLOWLIST.get(base_table(table) or table)
+        # an empty column name is reported for e.g. COUNT(*)
+        if cols is not None and (arg2 == "" or arg2 in cols):
+            return sqlite3.SQLITE_OK
+    return sqlite3.SQLITE_DENY
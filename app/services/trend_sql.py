@@ -0,0 +1,127 @@
+from __future__ import annotations
+import sqlite3
+from typing import Any, Dict, List, Optional, Tuple
+import pandas as pd
+from app.services.executor import run_sql, bind_dates, prune_partitions
+from app.services.chart_builder import OTHER_LABEL
+from app.services.range_cache import run_registry_sql
+from app.services.planner_registry import get_registry, render_kpi_sql
+
+# evaluate the KPI query once per statement instead of once per reference
+_MATERIALIZED = "MATERIALIZED " if sqlite3.sqlite_version_info >= (3, 35, 0) else ""
+
+def _base(sql: str) -> str:
+    return f"base(period, value, dim) AS {_MATERIALIZED}(\n{sql.strip().rstrip(';')}\n)"
+
+def summary_sql(sql: str, top_k: int, top_n: Optional[int], total_sql: Optional[str] = None) -> str:
+    """
+    Wrap a grouped registry KPI query so one statement returns the narrator stats
+    as a few (kind, label, value, share, dim) rows, followed by the chart series as
+    kind 'series' rows (label = period) limited to the top_n dimension values (by |total|).
+
+    Additive KPIs (total_sql None) sum the other values into OTHER_LABEL and take
+    period totals and shares from the members. For the rest (averages, rates) a sum
+    means nothing: the other values are dropped, period totals come from
+    `total_sql` (the ungrouped KPI query) and no shares are returned.
+    """
+    additive = total_sql is None
+    if not top_n:
+        series = "SELECT 'series', period, value, NULL, dim FROM base"
+    elif additive:
+        series = f"""SELECT 'series', period, SUM(value), NULL, dim FROM (
+  SELECT b.period, b.value, CASE WHEN r.rk <= {int(top_n)} THEN b.dim ELSE '{OTHER_LABEL}' END AS dim
+  FROM base b JOIN ranked r ON r.dim IS b.dim
+) GROUP BY period, dim"""
+    else:
+        series = f"""SELECT 'series', b.period, b.value, NULL, b.dim
+  FROM base b JOIN ranked r ON r.dim IS b.dim WHERE r.rk <= {int(top_n)}"""
+    if additive:
+        totals = "totals AS (SELECT period, TOTAL(value) AS value FROM base GROUP BY period)"
+        contrib = f"""
+UNION ALL SELECT 'contrib', dim, value, share, NULL FROM (
+  SELECT dim, value, share, ROW_NUMBER() OVER (ORDER BY share DESC) AS rk FROM (
+    SELECT dim, value, value * 100.0 / COALESCE(NULLIF(TOTAL(value) OVER (), 0), 1) AS share
+    FROM base WHERE period = (SELECT MAX(period) FROM totals)
+  )
+) WHERE rk <= {int(top_k)}"""
+    else:
+        totals = f"totals(period, value) AS {_MATERIALIZED}(\n{total_sql.strip().rstrip(';')}\n)"
+        contrib = ""
+    return f"""WITH {_base(sql)},
+{totals},
+m AS (
+  SELECT period, value,
+         LAG(value) OVER (ORDER BY period) AS prev,
+         ROW_NUMBER() OVER (ORDER BY period) AS first_rn,
+         ROW_NUMBER() OVER (ORDER BY period DESC) AS last_rn,
+         ROW_NUMBER() OVER (ORDER BY value DESC, period) AS peak_rn,
+         ROW_NUMBER() OVER (ORDER BY value, period) AS low_rn
+  FROM totals
+),
+ranked AS (
+  SELECT dim, ROW_NUMBER() OVER (ORDER BY ABS(TOTAL(value)) DESC) AS rk FROM base GROUP BY dim
+)
+SELECT 'first' AS kind, period AS label, value, NULL AS share, NULL AS dim FROM m WHERE first_rn = 1
+UNION ALL SELECT 'last', period, value, NULL, NULL FROM m WHERE last_rn = 1
+UNION ALL SELECT 'peak', period, value, NULL, NULL FROM m WHERE peak_rn = 1
+UNION ALL SELECT 'low', period, value, NULL, NULL FROM m WHERE low_rn = 1
+UNION ALL SELECT 'mom', NULL, AVG((value - prev) * 100.0 / (CASE WHEN prev = 0 THEN 1 ELSE prev END)), NULL, NULL
+  FROM m{contrib}
+UNION ALL SELECT 'dims', NULL, COUNT(*), NULL, NULL FROM ranked
+UNION ALL {series}"""
+
+def summarize(sql: str, start: str, end: str, meta: Dict[str, Any],
+              top_n: Optional[int], top_k: int = 5) -> Tuple[Optional[Dict[str, Any]], pd.DataFrame]:
+    """
+    Compute narrator stats in SQLite and fetch only the series the chart needs.
+
+    Returns (stats, series). For grouped KPIs one statement returns both: the
+    series is already cut to top_n dimension values, plus OTHER_LABEL for additive
+    KPIs (meta["top_n"] records it, as build_time_series would), so it is at most
+    periods x (top_n + 1) rows. Ungrouped KPIs gain nothing from this (the
+    series is one row per period), so stats is None: the plain query goes
+    through run_registry_sql and the caller computes stats from the frame.
+    """
+    dim = meta.get("dimension")
+    if not dim:
+        return None, run_registry_sql(sql, start, end, bool(meta.get("month_local")))
+    # the window functions and ranks span the whole window, so this can't be
+    # stitched from cached months the way run_registry_sql does
+    additive = bool(meta.get("additive"))
+    total_sql = None if additive else render_kpi_sql(get_registry().kpis[meta["kpi"]], [])
+    rows = run_sql(bind_dates(prune_partitions(summary_sql(sql, top_k, top_n, total_sql), start, end), start, end))
+    if rows.empty or not (rows["kind"] == "first").any():
+        raise ValueError("No data for the selected period/filters.")
+    by_kind = {k: g for k, g in rows.groupby("kind", sort=False)}
+
+    def one(kind: str) -> Tuple[str, float]:
+        r = by_kind[kind].iloc[0]
+        return str(r["label"]), float(r["value"] or 0.0)
+
+    (_, start_val), (_, end_val) = one("first"), one("last")
+    mom = by_kind["mom"].iloc[0]["value"]
+    top_contrib: Optional[List[Tuple[Any, float, float]]] = None
+    if "contrib" in by_kind:
+        c = by_kind["contrib"].sort_values("share", ascending=False)
+        top_contrib = [(r["label"], float(r["value"] or 0.0), float(r["share"] or 0.0)) for _, r in c.iterrows()]
+    stats = {
+        "unit": meta.get("unit"),
+        "start_value": start_val,
+        "end_value": end_val,
+        "total_delta_pct": ((end_val - start_val) / (start_val or 1)) * 100.0,
+        "avg_mom_pct": float(mom) if pd.notna(mom) else 0.0,
+        "peak": one("peak"),
+        "lowest": one("low"),
+        "top_contrib": top_contrib,
+    }
+
+    series = (by_kind["series"][["label", "value", "dim"]]
+              .set_axis(["period", "value", dim], axis=1)
+              .sort_values(["period", dim]).reset_index(drop=True))
+    n_dims = int(by_kind["dims"].iloc[0]["value"])
+    if top_n and n_dims > top_n:
+        meta["top_n"] = ({"n": top_n, "other_label": OTHER_LABEL, "folded_values": n_dims - top_n} if additive
+                         else {"n": top_n, "other_label": None, "dropped_values": n_dims - top_n})
+        meta["reduced"] = True
+    meta["stats_source"] = "sql"
+    return stats, series
@@ -56,18 +56,57 @@ with c1:
 with c2:
     st.markdown(f"<span class='pill'>API: {API_URL}</span>", unsafe_allow_html=True)
 
+ARROW = "application/vnd.apache.arrow.stream"
+MSGPACK = "application/x-msgpack"
+
+def _accept_header() -> str:
+    # advertise compact encodings only when we can decode them
+    types = []
+    try:
+        import pyarrow  # noqa: F401
+        types.append(ARROW)
+    except ImportError:
+        pass
+    try:
+        import msgpack  # noqa: F401
+        types.append(MSGPACK)
+    except ImportError:
+        pass
+    return ", ".join(types + ["application/json;q=0.5"])
+
+def _rows(cols: dict) -> list:
+    return [{"period": p, "value": v, "dimension": d}
+            for p, v, d in zip(cols["period"], cols["value"], cols["dimension"])]
+
+def _decode(resp) -> dict:
+    # requests already undoes gzip/br Content-Encoding
+    ct = resp.headers.get("content-type", "")
+    if ct.startswith(ARROW):
+        import pyarrow as pa
+        table = pa.ipc.open_stream(resp.content).read_all()
+        data = json.loads(table.schema.metadata[b"insightminer"])
+        data["chart"]["series"] = _rows(table.to_pydict())
+        return data
+    if ct.startswith(MSGPACK):
+        import msgpack
+        data = msgpack.unpackb(resp.content, raw=False)
+        if data["chart"].pop("series_format", None) == "columnar":
+            data["chart"]["series"] = _rows(data["chart"]["series"])
+        return data
+    return resp.json()
+
 @st.cache_data(show_spinner=False)
 def call_api(question: str, start: str, end: str, dims: list):
     resp = requests.post(
         f"{API_URL}/ask-llm/",
-        headers={"Content-Type": "application/json"},
+        headers={"Content-Type": "application/json", "Accept": _accept_header()},
         json={"question": question, "start": start, "end": end, "dims": dims},
         timeout=25,
     )
     ct = resp.headers.get("content-type", "")
-    if "application/json" not in ct:
-        raise RuntimeError(f"Non-JSON response ({resp.status_code}): {resp.text[:300]}")
-    data = resp.json()
+    if not any(t in ct for t in ("application/json", ARROW, MSGPACK)):
+        raise RuntimeError(f"Unexpected response ({resp.status_code}): {resp.text[:300]}")
+    data = _decode(resp)
     if resp.status_code >= 400:
         raise RuntimeError(data.get("detail") or data)
     return data
@@ -144,6 +183,15 @@ if ask_clicked:
             elif unit == "percent":
                 fig.update_yaxes(ticksuffix="%", tickformat=".1f")
             st.plotly_chart(fig, use_container_width=True)
+            notes = []
+            if meta.get("top_n"):
+                t = meta["top_n"]
+                notes.append(f"top {t['n']} values shown, {t['folded_values']} more grouped as “{t['other_label']}”")
+            if meta.get("downsampled"):
+                d = meta["downsampled"]
+                notes.append(f"downsampled from {d['from_points']:,} to {d['to_points']:,} points")
+            if notes:
+                st.caption("Reduced for display: " + "; ".join(notes) + ".")
 
         # ------------ Insights ------------
         if data.get("insights"):
@@ -0,0 +1,76 @@
+"""
+Cold-start budget for the API process.
+
+Imports app.main in fresh interpreters (from a directory other than the repo
+root, like a replica would) and reports the median wall time. Fails with exit
+code 5 if the median exceeds --budget or if any module that should stay off
+the /health path (pandas, numpy, jinja2, yaml, sqlalchemy, ...) was imported.
+With --ready it also drives the startup lifecycle to completion and reports the
+per-stage timings that /health/ready exposes.
+
+  python scripts/bench_startup.py [--runs 7] [--budget 1.0] [--ready]
+"""
+import argparse, json, pathlib, statistics, subprocess, sys, tempfile
+from typing import List, Optional
+
+ROOT = pathlib.Path(__file__).resolve().parents[1]
+DEFERRED = ("pandas", "numpy", "jinja2", "yaml", "sqlalchemy", "openai", "tiktoken")
+
+PROBE = """
+import json, sys, time
+sys.path.insert(0, {root!r})
+t0 = time.perf_counter()
+import app.main
+out = {{"import_secs": time.perf_counter() - t0,
+        "loaded": [m for m in {deferred!r} if m in sys.modules]}}
+if {ready!r}:
+    from app.core.lifecycle import STARTUP
+    STARTUP.start()
+    STARTUP.wait()
+    out["startup"] = STARTUP.snapshot()
+print(json.dumps(out))
+"""
+
+def probe(ready: bool) -> dict:
+    code = PROBE.format(root=str(ROOT), deferred=DEFERRED, ready=ready)
+    with tempfile.TemporaryDirectory() as cwd:
+        res = subprocess.run([sys.executable, "-c", code], cwd=cwd, capture_output=True, text=True)
+    if res.returncode != 0:
+        sys.stderr.write(res.stderr)
+        raise SystemExit(f"[ERR] importing app.main failed (exit {res.returncode})")
+    return json.loads(res.stdout.strip().splitlines()[-1])
+
+def main(argv: Optional[List[str]] = None) -> None:
+    ap = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    ap.add_argument("--runs", type=int, default=7)
+    ap.add_argument("--budget", type=float, default=1.0, help="max median import time (seconds)")
+    ap.add_argument("--ready", action="store_true", help="also run the startup stages once and report them")
+    args = ap.parse_args(argv)
+
+    runs = [probe(ready=False) for _ in range(args.runs)]
+    times = sorted(r["import_secs"] for r in runs)
+    median = statistics.median(times)
+    loaded = sorted({m for r in runs for m in r["loaded"]})
+    print(f"import app.main: median {median * 1000:.0f} ms, min {times[0] * 1000:.0f} ms, "
+          f"max {times[-1] * 1000:.0f} ms over {args.runs} runs (budget {args.budget * 1000:.0f} ms)")
+
+    if args.ready:
+        snap = probe(ready=True)["startup"]
+        for stage, secs in snap["stages"].items():
+            print(f"  {stage:10s} {secs * 1000:8.0f} ms")
+        print(f"  ready={snap['ready']} total={snap['total_secs'] * 1000:.0f} ms"
+              + (f" error={snap['error']}" if snap["error"] else ""))
+
+    failed = False
+    if loaded:
+        print(f"[FAIL] imported eagerly: {', '.join(loaded)}")
+        failed = True
+    if median > args.budget:
+        print("[FAIL] median import time over budget")
+        failed = True
+    if failed:
+        sys.exit(5)
+    print("[OK] within cold-start budget")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,223 @@
+"""
+Index advisor for the KPI registry.
+
+Renders every KPI x (no dimension + each allowed dimension) template, runs
+EXPLAIN QUERY PLAN, flags full table scans and temp B-tree sorts, and proposes
+one composite index per (query, table): equality/join columns first, then the
+range (date) column, then the remaining referenced columns so the index covers
+the query. With --apply each candidate is created and the KPI queries are
+re-timed; only indexes that speed up at least one query by --min-gain are kept.
+The chosen set (or, with --write, every proposal) goes to advised_indexes.sql,
+which load_ravenstack.py applies after every load.
+
+  python scripts/index_advisor.py --db sqlite:///data/warehouse/kpi_copilot.db [--apply | --write]
+"""
+import argparse, hashlib, pathlib, re, sqlite3, sys, time
+from collections import defaultdict
+from dataclasses import dataclass, field
+from typing import Dict, List, Optional, Set, Tuple
+
+ROOT = pathlib.Path(__file__).resolve().parents[1]
+sys.path.insert(0, str(ROOT))
+
+from app.services.partitions import base_table  # noqa: E402
+from app.services.planner_registry import Registry, REG_PATH, render_kpi_sql  # noqa: E402
+from partitions import PARTITIONED, partitions_of  # noqa: E402
+
+ADVISED_PATH = pathlib.Path(__file__).with_name("advised_indexes.sql")
+MAX_INDEX_COLS = 6
+
+@dataclass
+class Query:
+    label: str
+    sql: str
+    scans: List[str] = field(default_factory=list)
+    temp_btrees: List[str] = field(default_factory=list)
+
+@dataclass
+class Candidate:
+    table: str
+    columns: Tuple[str, ...]
+    reasons: Set[str] = field(default_factory=set)
+
+    @property
+    def name(self) -> str:
+        digest = hashlib.sha1(",".join(self.columns).encode()).hexdigest()[:8]
+        return f"adv_{self.table}_{digest}"
+
+    def ddl(self) -> str:
+        return f"CREATE INDEX IF NOT EXISTS {self.name} ON {self.table}({', '.join(self.columns)});"
+
+def _resolve_sqlite_path(db_uri: str) -> pathlib.Path:
+    return pathlib.Path(db_uri.replace("sqlite:///", "", 1) if db_uri.startswith("sqlite:///") else db_uri)
+
+def _tables(con: sqlite3.Connection) -> Set[str]:
+    rows = con.execute("SELECT name FROM sqlite_master WHERE type IN ('table','view') AND name NOT LIKE 'sqlite_%'")
+    return {r[0] for r in rows}
+
+def render_queries(reg: Registry, start: str, end: str) -> List[Query]:
+    out = []
+    for kpi in reg.kpis.values():
+        dim_sets = [[]] + [[reg.dimensions[d]] for d in kpi.allow_dimensions if d in reg.dimensions]
+        for dims in dim_sets:
+            sql = render_kpi_sql(kpi, dims).strip().rstrip(";")
+            sql = sql.replace(":start", f"'{start}'").replace(":end", f"'{end}'")
+            label = kpi.key + (f"[{dims[0].name}]" if dims else "")
+            out.append(Query(label=label, sql=sql))
+    return out
+
+def _aliases(sql: str, tables: Set[str]) -> Dict[str, str]:
+    aliases: Dict[str, str] = {}
+    for t, a in re.findall(r"\b(?:from|join)\s+([A-Za-z_]\w*)(?:\s+(?:as\s+)?([A-Za-z_]\w*))?", sql, re.I):
+        if t in tables:
+            aliases[t] = t
+            if a and a.lower() not in ("on", "where", "join", "left", "inner", "group", "order", "using"):
+                aliases[a] = t
+    return aliases
+
+def explain(con: sqlite3.Connection, q: Query, tables: Set[str]) -> None:
+    # plan rows name tables by alias; an AUTOMATIC index is one SQLite builds per query
+    aliases = _aliases(q.sql, tables)
+    q.scans, q.temp_btrees = [], []
+    for _, _, _, detail in con.execute(f"EXPLAIN QUERY PLAN {q.sql}"):
+        m = re.match(r"(SCAN|SEARCH) (\w+)", detail)
+        name = aliases.get(m.group(2), m.group(2)) if m else None
+        table = base_table(name) or name
+        if table in tables and ((m.group(1) == "SCAN" and "INDEX" not in detail) or "AUTOMATIC" in detail):
+            q.scans.append(table)
+        if "USE TEMP B-TREE" in detail:
+            q.temp_btrees.append(detail)
+
+def _column_roles(sql: str, tables: Set[str]) -> Dict[str, Dict[str, List[str]]]:
+    """table -> {"eq": [...], "range": [...], "other": [...]} from alias.column references."""
+    aliases = _aliases(sql, tables)
+    roles: Dict[str, Dict[str, List[str]]] = defaultdict(lambda: {"eq": [], "range": [], "other": []})
+
+    def add(table: str, role: str, col: str) -> None:
+        for r in roles[table].values():
+            if col in r:
+                return
+        roles[table][role].append(col)
+
+    ref = r"([A-Za-z_]\w*)\.([A-Za-z_]\w*)"
+    for a, c, a2, c2 in re.findall(rf"{ref}\s*=\s*{ref}", sql):
+        for al, col in ((a, c), (a2, c2)):
+            if al in aliases:
+                add(aliases[al], "eq", col)
+    for a, c in re.findall(rf"{ref}\s*\)?\s*(?:<=|>=|<|>|\bbetween\b)", sql, re.I):
+        if a in aliases:
+            add(aliases[a], "range", c)
+    for a, c in re.findall(rf"(?:<=|>=|<|>)\s*(?:\w+\()?{ref}", sql):
+        if a in aliases:
+            add(aliases[a], "range", c)
+    for a, c in re.findall(ref, sql):
+        if a in aliases:
+            add(aliases[a], "other", c)
+    return roles
+
+def propose(queries: List[Query], tables: Set[str]) -> List[Candidate]:
+    found: Dict[Tuple[str, Tuple[str, ...]], Candidate] = {}
+    for q in queries:
+        if not (q.scans or q.temp_btrees):
+            continue
+        roles = _column_roles(q.sql, tables)
+        for table in set(q.scans) or set(roles):
+            r = roles.get(table)
+            if not r:
+                continue
+            cols = tuple((r["eq"] + r["range"][:1] + r["other"] + r["range"][1:])[:MAX_INDEX_COLS])
+            if not cols:
+                continue
+            cand = found.setdefault((table, cols), Candidate(table, cols))
+            cand.reasons.add(f"{q.label}: " + ("scan" if table in q.scans else "temp b-tree"))
+    return list(found.values())
+
+def _time(con: sqlite3.Connection, sql: str, repeat: int) -> float:
+    best = float("inf")
+    for _ in range(repeat):
+        t0 = time.perf_counter()
+        con.execute(sql).fetchall()
+        best = min(best, time.perf_counter() - t0)
+    return best
+
+def _targets(con: sqlite3.Connection, cand: Candidate) -> List[Tuple[str, str]]:
+    """(index name, table) pairs: partitioned bases are views, so each partition gets the index."""
+    parts = partitions_of(con, cand.table) if cand.table in PARTITIONED else []
+    return [(f"{cand.name}_{p}", p) for p in parts] or [(cand.name, cand.table)]
+
+def _create(con: sqlite3.Connection, cand: Candidate) -> None:
+    for name, table in _targets(con, cand):
+        con.execute(f"CREATE INDEX IF NOT EXISTS {name} ON {table}({', '.join(cand.columns)})")
+
+def _drop(con: sqlite3.Connection, cand: Candidate) -> None:
+    for name, _ in _targets(con, cand):
+        con.execute(f"DROP INDEX IF EXISTS {name}")
+
+def benchmark(con: sqlite3.Connection, queries: List[Query], cands: List[Candidate],
+              repeat: int, min_gain: float) -> List[Candidate]:
+    baseline = {q.label: _time(con, q.sql, repeat) for q in queries}
+    kept = []
+    for cand in cands:
+        _create(con, cand)
+        con.execute("ANALYZE")
+        gains = {}
+        for q in queries:
+            if cand.table not in {base_table(t) or t for t in re.findall(r"\b\w+\b", q.sql)}:
+                continue
+            after = _time(con, q.sql, repeat)
+            gains[q.label] = (baseline[q.label] - after) / (baseline[q.label] or 1e-9)
+        best = max(gains.values(), default=0.0)
+        if best >= min_gain:
+            kept.append(cand)
+            for q in queries:   # later candidates are measured against the improved plan
+                if q.label in gains:
+                    baseline[q.label] = _time(con, q.sql, repeat)
+            print(f"[KEEP] {cand.ddl()}  best gain {best:.0%}")
+        else:
+            _drop(con, cand)
+            print(f"[DROP] {cand.ddl()}  best gain {best:.0%}")
+    con.commit()
+    return kept
+
+def write_advised(cands: List[Candidate], path: pathlib.Path = ADVISED_PATH) -> None:
+    lines = ["-- Generated by scripts/index_advisor.py; applied by load_ravenstack.py.",
+             "-- Indexes on feature_usage/support_tickets are created on every partition."]
+    for c in sorted(cands, key=lambda c: (c.table, c.columns)):
+        lines.append(f"-- {'; '.join(sorted(c.reasons))}")
+        lines.append(c.ddl())
+    path.write_text("\n".join(lines) + "\n", encoding="utf-8")
+    print(f"[OK] Wrote {len(cands)} indexes to {path}")
+
+def main(argv: Optional[List[str]] = None) -> None:
+    ap = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    ap.add_argument("--db", default="sqlite:///data/warehouse/kpi_copilot.db")
+    ap.add_argument("--registry", default=str(REG_PATH))
+    ap.add_argument("--start", default="2024-01-01")
+    ap.add_argument("--end", default="2024-12-31")
+    ap.add_argument("--apply", action="store_true", help="create, benchmark and keep only indexes that help")
+    ap.add_argument("--write", action="store_true", help="write the proposals without benchmarking")
+    ap.add_argument("--repeat", type=int, default=3)
+    ap.add_argument("--min-gain", type=float, default=0.10, help="minimum relative speed-up to keep an index")
+    args = ap.parse_args(argv)
+
+    reg = Registry(pathlib.Path(args.registry))
+    con = sqlite3.connect(str(_resolve_sqlite_path(args.db)))
+    tables = {base_table(t) or t for t in _tables(con)}
+    queries = render_queries(reg, args.start, args.end)
+    for q in queries:
+        explain(con, q, tables)
+        flags = [f"scan {t}" for t in q.scans] + [d.lower() for d in q.temp_btrees]
+        print(f"{q.label:40s} {', '.join(flags) or 'ok'}")
+
+    cands = propose(queries, tables)
+    print(f"\n{len(cands)} candidate indexes")
+    for c in cands:
+        print(f"  {c.ddl()}")
+    if args.apply:
+        cands = benchmark(con, queries, cands, args.repeat, args.min_gain)
+    if args.apply or args.write:
+        write_advised(cands)
+    con.close()
+
+if __name__ == "__main__":
+    main()
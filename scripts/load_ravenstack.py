@@ -1,5 +1,10 @@
-import argparse, pathlib, sqlite3, pandas as pd, os, sys
+import argparse, pathlib, sqlite3, pandas as pd, os, re, sys
 from datetime import datetime
+from rollups import rebuild_rollups, refresh_rollups, changed_ranges, verify_rollups
+from partitions import PARTITIONED, write_partitioned, archive_partitions, partitions_of
+
+# written by index_advisor.py
+ADVISED_INDEXES = pathlib.Path(__file__).with_name("advised_indexes.sql")
 
 def read_csv(path, **kw):
     return pd.read_csv(path, na_values=["", "null", "None"], keep_default_na=True, **kw)
@@ -32,7 +37,34 @@ def _resolve_sqlite_path(db_uri: str) -> pathlib.Path:
     p.parent.mkdir(parents=True, exist_ok=True)
     return p
 
-def load_tables(csv_dir: pathlib.Path, db_uri: str):
+def apply_advised_indexes(con):
+    if not ADVISED_INDEXES.exists():
+        return
+    ddl = re.findall(r"CREATE INDEX IF NOT EXISTS (\w+) ON (\w+)\(([^)]*)\);",
+                     ADVISED_INDEXES.read_text(encoding="utf-8"))
+    for name, table, cols in ddl:
+        # partitioned tables are views; index each partition
+        targets = [(f"{name}_{p}", p) for p in partitions_of(con, table)] if table in PARTITIONED else [(name, table)]
+        for idx, target in targets:
+            con.execute(f"CREATE INDEX IF NOT EXISTS {idx} ON {target}({cols})")
+    print(f"[OK] Applied {len(ddl)} advised indexes from {ADVISED_INDEXES.name}")
+
+# table, csv file, date columns, boolean columns, numeric columns
+TABLES = [
+    ("accounts", "ravenstack_accounts.csv", ["signup_date"],
+     ["is_trial","churn_flag"], []),
+    ("subscriptions", "ravenstack_subscriptions.csv", ["start_date","end_date"],
+     ["is_trial","upgrade_flag","downgrade_flag","churn_flag","auto_renew_flag"], ["mrr_amount","arr_amount","seats"]),
+    ("feature_usage", "ravenstack_feature_usage.csv", ["usage_date"],
+     ["is_beta_feature"], ["usage_count","usage_duration_secs","error_count"]),
+    ("support_tickets", "ravenstack_support_tickets.csv", ["submitted_at","closed_at"],
+     ["escalation_flag"], ["resolution_time_hours","first_response_time_minutes","satisfaction_score"]),
+    ("churn_events", "ravenstack_churn_events.csv", ["churn_date"],
+     ["preceding_upgrade_flag","preceding_downgrade_flag","is_reactivation"], ["refund_amount_usd"]),
+]
+
+def load_tables(csv_dir: pathlib.Path, db_uri: str, append: bool = False, check_rollups: bool = False,
+                archive_before: str | None = None):
     csv_dir = csv_dir.expanduser().resolve()
     if not csv_dir.exists():
         print(f"[ERROR] CSV directory not found: {csv_dir}", file=sys.stderr)
@@ -53,34 +85,20 @@ def load_tables(csv_dir: pathlib.Path, db_uri: str):
     con.execute("PRAGMA synchronous=NORMAL;")
     con.execute("PRAGMA foreign_keys=ON;")
 
-    # --- accounts
-    acc = read_csv(csv_dir/"ravenstack_accounts.csv", parse_dates=["signup_date"])
-    acc = normalize_booleans(acc, ["is_trial","churn_flag"])
-    acc.to_sql("accounts", con, if_exists="replace", index=False)
-
-    # --- subscriptions
-    subs = read_csv(csv_dir/"ravenstack_subscriptions.csv", parse_dates=["start_date","end_date"])
-    subs = normalize_booleans(subs, ["is_trial","upgrade_flag","downgrade_flag","churn_flag","auto_renew_flag"])
-    subs = coerce_numeric(subs, ["mrr_amount","arr_amount","seats"])
-    subs.to_sql("subscriptions", con, if_exists="replace", index=False)
-
-    # --- feature_usage
-    fu = read_csv(csv_dir/"ravenstack_feature_usage.csv", parse_dates=["usage_date"])
-    fu = normalize_booleans(fu, ["is_beta_feature"])
-    fu = coerce_numeric(fu, ["usage_count","usage_duration_secs","error_count"])
-    fu.to_sql("feature_usage", con, if_exists="replace", index=False)
-
-    # --- support_tickets
-    st = read_csv(csv_dir/"ravenstack_support_tickets.csv", parse_dates=["submitted_at","closed_at"])
-    st = normalize_booleans(st, ["escalation_flag"])
-    st = coerce_numeric(st, ["resolution_time_hours","first_response_time_minutes","satisfaction_score"])
-    st.to_sql("support_tickets", con, if_exists="replace", index=False)
-
-    # --- churn_events
-    ce = read_csv(csv_dir/"ravenstack_churn_events.csv", parse_dates=["churn_date"])
-    ce = normalize_booleans(ce, ["preceding_upgrade_flag","preceding_downgrade_flag","is_reactivation"])
-    ce = coerce_numeric(ce, ["refund_amount_usd"])
-    ce.to_sql("churn_events", con, if_exists="replace", index=False)
+    mode = "append" if append else "replace"
+    frames = {}
+    for table, csv_name, dates, bools, nums in TABLES:
+        path = csv_dir/csv_name
+        if append and not path.exists():
+            continue   # appending: only the tables that received new rows
+        df = read_csv(path, parse_dates=dates)
+        df = normalize_booleans(df, bools)
+        df = coerce_numeric(df, nums)
+        if table in PARTITIONED:
+            write_partitioned(con, table, df, append=append)
+        else:
+            df.to_sql(table, con, if_exists=mode, index=False)
+        frames[table] = df
 
     con.executescript("""
     CREATE INDEX IF NOT EXISTS idx_accounts_id ON accounts(account_id);
@@ -93,24 +111,43 @@ def load_tables(csv_dir: pathlib.Path, db_uri: str):
     CREATE INDEX IF NOT EXISTS idx_subs_end ON subscriptions(end_date);
     CREATE INDEX IF NOT EXISTS idx_subs_plan ON subscriptions(plan_tier);
 
-    CREATE INDEX IF NOT EXISTS idx_fu_sub ON feature_usage(subscription_id);
-    CREATE INDEX IF NOT EXISTS idx_fu_date ON feature_usage(usage_date);
-    CREATE INDEX IF NOT EXISTS idx_fu_feature ON feature_usage(feature_name);
-
-    CREATE INDEX IF NOT EXISTS idx_st_account ON support_tickets(account_id);
-    CREATE INDEX IF NOT EXISTS idx_st_submitted ON support_tickets(submitted_at);
+    -- feature_usage / support_tickets are partitioned; see partitions.PARTITION_INDEXES
 
     CREATE INDEX IF NOT EXISTS idx_ce_account ON churn_events(account_id);
     CREATE INDEX IF NOT EXISTS idx_ce_date ON churn_events(churn_date);
     """)
+    apply_advised_indexes(con)
 
     con.commit()
+
+    # archived partitions leave the views; rollups still read them (partitions.with_archive)
+    if archive_before:
+        archive_db = db_path.with_name(f"{db_path.stem}_archive{db_path.suffix}")
+        moved = archive_partitions(con, archive_before, archive_db)
+        print(f"[OK] Archived {len(moved)} partitions to {archive_db}")
+
+    # --- rollups: only the months touched by the new rows when appending
+    if append:
+        refresh_rollups(con, changed_ranges(frames))
+    else:
+        rebuild_rollups(con)
+    ok = verify_rollups(con) if check_rollups else True
+
     con.close()
-    print(f"[OK] Loaded CSVs into {db_path}")
+    print(f"[OK] Loaded CSVs into {db_path} ({'append' if append else 'replace'})")
+    if not ok:
+        sys.exit(4)
 
 if __name__ == "__main__":
     ap = argparse.ArgumentParser()
     ap.add_argument("--csv_dir", required=True, help="path to /data/raw")
     ap.add_argument("--db", default="sqlite:///data/warehouse/kpi_copilot.db")
+    ap.add_argument("--append", action="store_true",
+                    help="append CSV rows to existing tables and refresh only affected rollup months")
+    ap.add_argument("--check-rollups", action="store_true",
+                    help="compare rollups against a full rebuild (exit 4 on mismatch)")
+    ap.add_argument("--archive-before", default=None, metavar="YYYY-MM-DD",
+                    help="move feature_usage/support_tickets partitions older than this date to an archive DB")
     args = ap.parse_args()
-    load_tables(pathlib.Path(args.csv_dir), args.db)
+    load_tables(pathlib.Path(args.csv_dir), args.db, append=args.append, check_rollups=args.check_rollups,
+                archive_before=args.archive_before)
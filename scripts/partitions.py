@@ -0,0 +1,165 @@
+"""
+Quarterly partitions for the append-heavy fact tables.
+
+Each partitioned base table is stored as `<base>_pYYYYqN` tables (plus
+`<base>_pnone` for rows without a date), recorded in the `_partitions`
+catalog, and exposed under the original name as a UNION ALL view, so registry
+SQL keeps working unchanged. The API prunes to the partitions overlapping a
+request's :start/:end (app/services/partitions.py).
+
+Archived partitions move to a separate database and are recorded in
+`_archived_partitions`; inside `with_archive(con)` the base names cover them
+again, which is how rollups keep counting archived history.
+"""
+import pathlib
+import sqlite3
+import sys
+from contextlib import contextmanager
+from typing import Dict, Iterator, List
+
+import pandas as pd
+
+ROOT = pathlib.Path(__file__).resolve().parents[1]
+if str(ROOT) not in sys.path:
+    sys.path.insert(0, str(ROOT))
+
+# base table -> partition key column, shared with the API's pruning
+from app.services.partitions import PARTITIONED  # noqa: E402
+
+# single-column indexes created on every partition
+PARTITION_INDEXES: Dict[str, List[str]] = {
+    "feature_usage": ["subscription_id", "usage_date", "feature_name"],
+    "support_tickets": ["account_id", "submitted_at"],
+}
+
+def _ensure_catalog(con: sqlite3.Connection) -> None:
+    con.execute("""
+        CREATE TABLE IF NOT EXISTS _partitions (
+            name TEXT PRIMARY KEY, base TEXT NOT NULL,
+            lo TEXT, hi TEXT            -- [lo, hi) on the key column; NULL for the undated partition
+        )""")
+    con.execute("""
+        CREATE TABLE IF NOT EXISTS _archived_partitions (
+            name TEXT NOT NULL, base TEXT NOT NULL, lo TEXT, hi TEXT,
+            archive_db TEXT NOT NULL,   -- absolute path of the database holding the table
+            PRIMARY KEY (name, archive_db)
+        )""")
+
+def _object_type(con: sqlite3.Connection, name: str):
+    row = con.execute("SELECT type FROM sqlite_master WHERE name=?", (name,)).fetchone()
+    return row[0] if row else None
+
+def partitions_of(con: sqlite3.Connection, base: str) -> List[str]:
+    _ensure_catalog(con)
+    return [r[0] for r in con.execute(
+        "SELECT name FROM _partitions WHERE base=? ORDER BY lo IS NULL, lo", (base,))]
+
+def _rebuild_view(con: sqlite3.Connection, base: str) -> None:
+    if _object_type(con, base) == "view":
+        con.execute(f"DROP VIEW {base}")
+    parts = partitions_of(con, base)
+    if parts:
+        con.execute(f"CREATE VIEW {base} AS " + " UNION ALL ".join(f"SELECT * FROM {p}" for p in parts))
+
+def _drop_partitions(con: sqlite3.Connection, base: str) -> None:
+    for p in partitions_of(con, base):
+        con.execute(f"DROP TABLE IF EXISTS {p}")
+    con.execute("DELETE FROM _partitions WHERE base=?", (base,))
+
+def write_partitioned(con: sqlite3.Connection, base: str, df: pd.DataFrame, append: bool) -> None:
+    """Write `df` into quarterly partitions of `base` and refresh the union view."""
+    _ensure_catalog(con)
+    kind = _object_type(con, base)
+    if kind == "view":
+        con.execute(f"DROP VIEW {base}")
+    elif kind == "table":
+        # pre-partitioning layout: fold existing rows in when appending
+        if append:
+            df = pd.concat([pd.read_sql(f"SELECT * FROM {base}", con, parse_dates=[PARTITIONED[base]]), df],
+                           ignore_index=True)
+        con.execute(f"DROP TABLE {base}")
+    if not append:
+        _drop_partitions(con, base)
+        # a full reload replaces history, archived quarters included
+        con.execute("DELETE FROM _archived_partitions WHERE base=?", (base,))
+
+    key = pd.to_datetime(df[PARTITIONED[base]], errors="coerce")
+    quarters = key.dt.to_period("Q")
+    for q in sorted(quarters.dropna().unique()):
+        name = f"{base}_p{q.year}q{q.quarter}"
+        lo, hi = q.start_time.strftime("%Y-%m-%d"), (q + 1).start_time.strftime("%Y-%m-%d")
+        _write_part(con, base, name, df[quarters == q], lo, hi)
+    if key.isna().any():
+        _write_part(con, base, f"{base}_pnone", df[key.isna()], None, None)
+    _rebuild_view(con, base)
+
+def _write_part(con, base, name, part: pd.DataFrame, lo, hi) -> None:
+    part.to_sql(name, con, if_exists="append", index=False)
+    con.execute("INSERT OR REPLACE INTO _partitions (name, base, lo, hi) VALUES (?, ?, ?, ?)",
+                (name, base, lo, hi))
+    for col in PARTITION_INDEXES.get(base, []):
+        con.execute(f"CREATE INDEX IF NOT EXISTS idx_{name}_{col} ON {name}({col})")
+
+def archive_partitions(con: sqlite3.Connection, before: str, archive_db: pathlib.Path) -> List[str]:
+    """
+    Move partitions entirely older than `before` into `archive_db`; they leave the
+    views. A partition re-created by a late append is merged into its archived table.
+    """
+    _ensure_catalog(con)
+    rows = con.execute("SELECT name, base, lo, hi FROM _partitions WHERE hi IS NOT NULL AND hi <= ?",
+                       (before,)).fetchall()
+    if not rows:
+        return []
+    archive_db = str(pathlib.Path(archive_db).resolve())
+    con.commit()
+    con.execute("ATTACH DATABASE ? AS archive", (archive_db,))
+    try:
+        for name, base, lo, hi in rows:
+            if con.execute("SELECT 1 FROM archive.sqlite_master WHERE type='table' AND name=?", (name,)).fetchone():
+                con.execute(f"INSERT INTO archive.{name} SELECT * FROM main.{name}")
+            else:
+                con.execute(f"CREATE TABLE archive.{name} AS SELECT * FROM main.{name}")
+            con.execute(f"DROP TABLE main.{name}")
+            con.execute("DELETE FROM _partitions WHERE name=?", (name,))
+            con.execute("INSERT OR REPLACE INTO _archived_partitions (name, base, lo, hi, archive_db) "
+                        "VALUES (?, ?, ?, ?, ?)", (name, base, lo, hi, archive_db))
+        for base in {r[1] for r in rows}:
+            _rebuild_view(con, base)
+        con.commit()
+    finally:
+        con.execute("DETACH DATABASE archive")
+    return [r[0] for r in rows]
+
+@contextmanager
+def with_archive(con: sqlite3.Connection) -> Iterator[None]:
+    """
+    Attach the archive databases and shadow each partitioned base with a TEMP view
+    over its live and archived partitions, so unqualified names see full history.
+    Commits on exit (ATTACH/DETACH can't run inside a transaction).
+    """
+    _ensure_catalog(con)
+    rows = con.execute("SELECT name, base, archive_db FROM _archived_partitions").fetchall()
+    if not rows:
+        yield
+        return
+    schemas = {db: f"archive{i}" for i, db in enumerate(sorted({r[2] for r in rows}))}
+    bases = sorted({r[1] for r in rows})
+    con.commit()
+    for db, schema in schemas.items():
+        con.execute(f"ATTACH DATABASE ? AS {schema}", (db,))
+    try:
+        for base in bases:
+            parts = [f"SELECT * FROM {schemas[db]}.{name}" for name, b, db in rows if b == base]
+            if _object_type(con, base) == "view":
+                parts.insert(0, f"SELECT * FROM main.{base}")
+            con.execute(f"CREATE TEMP VIEW {base} AS " + " UNION ALL ".join(parts))
+        yield
+        con.commit()
+    except BaseException:
+        con.rollback()
+        raise
+    finally:
+        for base in bases:
+            con.execute(f"DROP VIEW IF EXISTS temp.{base}")
+        for schema in schemas.values():
+            con.execute(f"DETACH DATABASE {schema}")
@@ -0,0 +1,213 @@
+"""
+Monthly KPI rollup tables, maintained either from scratch or incrementally.
+
+Every rollup is keyed by `month` (first day of month, 'YYYY-MM-DD') and is
+produced by one SELECT over the base tables for a month window [:lo, :hi].
+A full rebuild runs it over the whole history; an incremental refresh deletes
+and recomputes only the months touched by newly appended rows. Because both
+paths share the same SQL, verify() can compare them exactly.
+
+Partitions moved out by archive_partitions still count: every public function
+runs inside partitions.with_archive, so base tables include archived rows.
+
+Limitation: edits to existing dimension rows (e.g. an account changing country)
+are not date-scoped; run a full rebuild after such changes.
+"""
+import sqlite3
+from dataclasses import dataclass, field
+from typing import Dict, List, Optional, Tuple
+
+import pandas as pd
+
+from partitions import with_archive
+
+MonthRange = Tuple[str, str]   # inclusive, both 'YYYY-MM-01'
+
+@dataclass
+class Rollup:
+    name: str
+    ddl: str
+    select: str                     # uses :lo / :hi (month starts)
+    keys: List[str]
+    metrics: List[str]
+    sources: Dict[str, List[str]] = field(default_factory=dict)   # base table -> date columns
+    open_ended: bool = False        # rows stay active until an end date (or forever)
+
+ROLLUPS: List[Rollup] = [
+    Rollup(
+        name="rollup_mrr_monthly",
+        ddl="""CREATE TABLE IF NOT EXISTS rollup_mrr_monthly (
+            month TEXT NOT NULL, country TEXT, plan_tier TEXT,
+            mrr REAL NOT NULL, active_subs INTEGER NOT NULL)""",
+        select="""
+            WITH RECURSIVE months(m) AS (
+                SELECT date(:lo) UNION ALL
+                SELECT date(m, '+1 month') FROM months WHERE m < date(:hi)
+            )
+            SELECT months.m AS month, a.country, s.plan_tier,
+                   SUM(COALESCE(s.mrr_amount, 0)) AS mrr, COUNT(*) AS active_subs
+            FROM months
+            JOIN subscriptions s
+              ON date(s.start_date) <= date(months.m, '+1 month', '-1 day')
+             AND date(COALESCE(s.end_date, '9999-12-31')) >= months.m
+            JOIN accounts a ON a.account_id = s.account_id
+            GROUP BY 1, 2, 3""",
+        keys=["month", "country", "plan_tier"],
+        metrics=["mrr", "active_subs"],
+        sources={"subscriptions": ["start_date", "end_date"]},
+        open_ended=True,
+    ),
+    Rollup(
+        name="rollup_feature_usage_monthly",
+        ddl="""CREATE TABLE IF NOT EXISTS rollup_feature_usage_monthly (
+            month TEXT NOT NULL, feature_name TEXT, plan_tier TEXT, country TEXT,
+            usage_count REAL, usage_duration_secs REAL, error_count REAL, events INTEGER NOT NULL)""",
+        select="""
+            SELECT date(f.usage_date, 'start of month') AS month, f.feature_name, s.plan_tier, a.country,
+                   SUM(f.usage_count) AS usage_count, SUM(f.usage_duration_secs) AS usage_duration_secs,
+                   SUM(f.error_count) AS error_count, COUNT(*) AS events
+            FROM feature_usage f
+            JOIN subscriptions s ON s.subscription_id = f.subscription_id
+            JOIN accounts a ON a.account_id = s.account_id
+            WHERE f.usage_date >= date(:lo) AND f.usage_date < date(:hi, '+1 month')
+            GROUP BY 1, 2, 3, 4""",
+        keys=["month", "feature_name", "plan_tier", "country"],
+        metrics=["usage_count", "usage_duration_secs", "error_count", "events"],
+        sources={"feature_usage": ["usage_date"]},
+    ),
+    Rollup(
+        name="rollup_tickets_monthly",
+        ddl="""CREATE TABLE IF NOT EXISTS rollup_tickets_monthly (
+            month TEXT NOT NULL, country TEXT, priority TEXT,
+            tickets INTEGER NOT NULL, resolution_hours_sum REAL, resolved INTEGER,
+            satisfaction_sum REAL, satisfaction_n INTEGER, escalations INTEGER)""",
+        select="""
+            SELECT date(t.submitted_at, 'start of month') AS month, a.country, t.priority,
+                   COUNT(*) AS tickets,
+                   SUM(t.resolution_time_hours) AS resolution_hours_sum,
+                   COUNT(t.resolution_time_hours) AS resolved,
+                   SUM(t.satisfaction_score) AS satisfaction_sum,
+                   COUNT(t.satisfaction_score) AS satisfaction_n,
+                   SUM(CASE WHEN t.escalation_flag THEN 1 ELSE 0 END) AS escalations
+            FROM support_tickets t
+            JOIN accounts a ON a.account_id = t.account_id
+            WHERE t.submitted_at >= date(:lo) AND t.submitted_at < date(:hi, '+1 month')
+            GROUP BY 1, 2, 3""",
+        keys=["month", "country", "priority"],
+        metrics=["tickets", "resolution_hours_sum", "resolved", "satisfaction_sum",
+                 "satisfaction_n", "escalations"],
+        sources={"support_tickets": ["submitted_at"]},
+    ),
+    Rollup(
+        name="rollup_churn_monthly",
+        ddl="""CREATE TABLE IF NOT EXISTS rollup_churn_monthly (
+            month TEXT NOT NULL, country TEXT, reason_code TEXT,
+            churn_events INTEGER NOT NULL, refund_amount_usd REAL)""",
+        select="""
+            SELECT date(c.churn_date, 'start of month') AS month, a.country, c.reason_code,
+                   COUNT(*) AS churn_events, SUM(c.refund_amount_usd) AS refund_amount_usd
+            FROM churn_events c
+            JOIN accounts a ON a.account_id = c.account_id
+            WHERE c.churn_date >= date(:lo) AND c.churn_date < date(:hi, '+1 month')
+            GROUP BY 1, 2, 3""",
+        keys=["month", "country", "reason_code"],
+        metrics=["churn_events", "refund_amount_usd"],
+        sources={"churn_events": ["churn_date"]},
+    ),
+]
+
+# ---------- helpers ----------
+def _month(ts) -> Optional[str]:
+    if ts is None or pd.isna(ts):
+        return None
+    return pd.Timestamp(ts).strftime("%Y-%m-01")
+
+def _next_month(m: str) -> str:
+    return (pd.Timestamp(m) + pd.offsets.MonthBegin(1)).strftime("%Y-%m-01")
+
+def _history(con: sqlite3.Connection, r: Rollup) -> Optional[MonthRange]:
+    """Full month span the rollup should cover, from its base tables."""
+    parts = []
+    for table, cols in r.sources.items():
+        exprs = ", ".join(f"MIN({c}), MAX({c})" for c in cols)
+        parts.extend(con.execute(f"SELECT {exprs} FROM {table}").fetchone())
+    months = [m for m in map(_month, [p for p in parts if p is not None]) if m]
+    if not months:
+        return None
+    return min(months), max(months)
+
+def _ensure(con: sqlite3.Connection, r: Rollup) -> None:
+    con.execute(r.ddl)
+    con.execute(f"CREATE INDEX IF NOT EXISTS idx_{r.name}_month ON {r.name}(month)")
+
+def _recompute(con: sqlite3.Connection, r: Rollup, rng: MonthRange) -> int:
+    lo, hi = rng
+    con.execute(f"DELETE FROM {r.name} WHERE month BETWEEN ? AND ?", (lo, hi))
+    cur = con.execute(f"INSERT INTO {r.name} {r.select}", {"lo": lo, "hi": hi})
+    return cur.rowcount
+
+# ---------- public API ----------
+def rebuild_rollups(con: sqlite3.Connection) -> None:
+    with with_archive(con):
+        for r in ROLLUPS:
+            _ensure(con, r)
+            con.execute(f"DELETE FROM {r.name}")
+            rng = _history(con, r)
+            if rng:
+                n = _recompute(con, r, rng)
+                print(f"[OK] {r.name}: full rebuild {rng[0]}..{rng[1]} ({n} rows)")
+        con.commit()
+
+def changed_ranges(new_rows: Dict[str, pd.DataFrame]) -> Dict[str, MonthRange]:
+    """Month span per base table touched by freshly appended rows."""
+    out: Dict[str, MonthRange] = {}
+    for r in ROLLUPS:
+        for table, cols in r.sources.items():
+            df = new_rows.get(table)
+            if df is None or df.empty:
+                continue
+            months = [m for c in cols if c in df.columns
+                      for m in (_month(df[c].min()), _month(df[c].max())) if m]
+            if months:
+                out[table] = (min(months), max(months))
+    return out
+
+def refresh_rollups(con: sqlite3.Connection, changed: Dict[str, MonthRange]) -> None:
+    """Recompute only the months affected by `changed` (see changed_ranges)."""
+    with with_archive(con):
+        for r in ROLLUPS:
+            _ensure(con, r)
+            spans = [changed[t] for t in r.sources if t in changed]
+            if not spans:
+                continue
+            lo, hi = min(s[0] for s in spans), max(s[1] for s in spans)
+            history = _history(con, r)
+            if r.open_ended and history:
+                # open-ended rows count in every later month; the horizon may have grown too
+                prev_max = con.execute(f"SELECT MAX(month) FROM {r.name}").fetchone()[0]
+                hi = max(hi, history[1])
+                lo = min(lo, _next_month(prev_max)) if prev_max else history[0]
+            n = _recompute(con, r, (lo, hi))
+            print(f"[OK] {r.name}: incremental {lo}..{hi} ({n} rows)")
+        con.commit()
+
+def verify_rollups(con: sqlite3.Connection, places: int = 6) -> bool:
+    """Compare every rollup with a from-scratch rebuild; True when they match."""
+    with with_archive(con):
+        return all([_verify(con, r, places) for r in ROLLUPS])
+
+def _verify(con: sqlite3.Connection, r: Rollup, places: int) -> bool:
+    _ensure(con, r)
+    check = f"temp.{r.name}_check"
+    con.execute(f"DROP TABLE IF EXISTS {check}")
+    con.execute(f"CREATE TABLE {check} AS SELECT * FROM {r.name} WHERE 0")
+    rng = _history(con, r)
+    if rng:
+        con.execute(f"INSERT INTO {check} {r.select}", {"lo": rng[0], "hi": rng[1]})
+    cols = ", ".join(r.keys + [f"ROUND({m}, {places})" for m in r.metrics])
+    missing = con.execute(f"SELECT COUNT(*) FROM (SELECT {cols} FROM {check} EXCEPT SELECT {cols} FROM {r.name})").fetchone()[0]
+    extra = con.execute(f"SELECT COUNT(*) FROM (SELECT {cols} FROM {r.name} EXCEPT SELECT {cols} FROM {check})").fetchone()[0]
+    con.execute(f"DROP TABLE {check}")
+    status = "OK" if not (missing or extra) else "MISMATCH"
+    print(f"[{status}] {r.name}: missing={missing} extra={extra}")
+    return not (missing or extra)
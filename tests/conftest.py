@@ -0,0 +1,87 @@
+import os, pathlib, sqlite3, sys
+
+import pytest
+
+ROOT = pathlib.Path(__file__).resolve().parents[1]
+sys.path.insert(0, str(ROOT))
+sys.path.insert(0, str(ROOT / "scripts"))
+
+# before any app import: Settings and the registry path are read at import time
+os.environ["KPI_REGISTRY_PATH"] = str(ROOT / "tests" / "data" / "kpis.yaml")
+os.environ["CACHE_BACKEND"] = "memory"
+os.environ.pop("OPENAI_API_KEY", None)
+
+import pandas as pd  # noqa: E402
+
+COUNTRIES = ["US", "DE", "FR", "JP", "BR", "IN", "GB", "CA"]
+TIERS = ["basic", "pro", "enterprise"]
+
+def _frames(seed: int = 7) -> dict:
+    import numpy as np
+    rng = np.random.default_rng(seed)
+    accounts = pd.DataFrame({
+        "account_id": [f"A{i:03d}" for i in range(40)],
+        "account_name": [f"acct {i}" for i in range(40)],
+        "country": [COUNTRIES[i % len(COUNTRIES)] for i in range(40)],
+        "plan_tier": [TIERS[i % len(TIERS)] for i in range(40)],
+        "signup_date": pd.Timestamp("2023-01-01") + pd.to_timedelta(rng.integers(0, 365, 40), unit="D"),
+    })
+    subs = pd.DataFrame({
+        "subscription_id": [f"S{i:03d}" for i in range(120)],
+        "account_id": [f"A{i % 40:03d}" for i in range(120)],
+        "start_date": pd.Timestamp("2023-10-01") + pd.to_timedelta(rng.integers(0, 450, 120), unit="D"),
+        "end_date": pd.NaT,
+        "plan_tier": [TIERS[i % len(TIERS)] for i in range(120)],
+        "mrr_amount": rng.integers(50, 2000, 120).astype(float),
+    })
+    usage = pd.DataFrame({
+        "usage_id": [f"U{i:04d}" for i in range(600)],
+        "subscription_id": [f"S{i % 120:03d}" for i in range(600)],
+        "usage_date": pd.Timestamp("2023-07-01") + pd.to_timedelta(rng.integers(0, 600, 600), unit="D"),
+        "feature_name": [f"feat_{i % 6}" for i in range(600)],
+        "usage_count": rng.integers(1, 20, 600),
+        "usage_duration_secs": rng.integers(10, 900, 600),
+        "error_count": rng.integers(0, 3, 600),
+    })
+    tickets = pd.DataFrame({
+        "ticket_id": [f"T{i:04d}" for i in range(300)],
+        "account_id": [f"A{i % 40:03d}" for i in range(300)],
+        "submitted_at": pd.Timestamp("2023-07-01") + pd.to_timedelta(rng.integers(0, 600, 300), unit="D"),
+        "priority": [["low", "medium", "high"][i % 3] for i in range(300)],
+        "resolution_time_hours": rng.integers(1, 72, 300).astype(float),
+        "satisfaction_score": rng.integers(1, 6, 300).astype(float),
+        "escalation_flag": rng.integers(0, 2, 300),
+    })
+    churn = pd.DataFrame({
+        "churn_event_id": [f"C{i:03d}" for i in range(30)],
+        "account_id": [f"A{i % 40:03d}" for i in range(30)],
+        "churn_date": pd.Timestamp("2023-09-01") + pd.to_timedelta(rng.integers(0, 450, 30), unit="D"),
+        "reason_code": [["price", "features", "support"][i % 3] for i in range(30)],
+        "refund_amount_usd": rng.integers(0, 500, 30).astype(float),
+    })
+    return {"accounts": accounts, "subscriptions": subs, "feature_usage": usage,
+            "support_tickets": tickets, "churn_events": churn}
+
+def build_warehouse(path: pathlib.Path, partitioned: bool = True) -> dict:
+    """Write the synthetic warehouse to `path`; returns the source frames."""
+    from partitions import PARTITIONED, write_partitioned
+    frames = _frames()
+    con = sqlite3.connect(str(path))
+    for table, df in frames.items():
+        if partitioned and table in PARTITIONED:
+            write_partitioned(con, table, df, append=False)
+        else:
+            df.to_sql(table, con, index=False)
+    con.commit()
+    con.close()
+    return frames
+
+@pytest.fixture
+def warehouse(tmp_path, monkeypatch):
+    """A partitioned SQLite warehouse wired into app.services.executor."""
+    from sqlalchemy import create_engine
+    from app.services import executor
+    db = tmp_path / "warehouse.db"
+    build_warehouse(db)
+    monkeypatch.setattr(executor, "_engine", create_engine(f"sqlite:///{db}", future=True))
+    return db
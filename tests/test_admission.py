@@ -0,0 +1,74 @@
+import threading, time
+
+import pytest
+
+from app.services.admission import (
+    AdmissionController, Overloaded, PRIORITY_LLM_SQL, PRIORITY_REGISTRY,
+)
+
+def _queued(gate, priority, order, errors):
+    def run():
+        try:
+            with gate.slot(priority):
+                order.append(priority)
+        except Overloaded as e:
+            errors.append((priority, e))
+    t = threading.Thread(target=run)
+    t.start()
+    return t
+
+def _wait_depth(gate, depth):
+    for _ in range(200):
+        if gate.snapshot()["queue_depth"] == depth:
+            return
+        time.sleep(0.005)
+    raise AssertionError(f"queue never reached {depth}")
+
+def test_higher_priority_waiter_is_served_first():
+    gate = AdmissionController("t", limit=1, max_queue=8, max_wait=2.0)
+    order, errors = [], []
+    gate.acquire(PRIORITY_REGISTRY)
+    t_low = _queued(gate, PRIORITY_LLM_SQL, order, errors)
+    _wait_depth(gate, 1)
+    t_high = _queued(gate, PRIORITY_REGISTRY, order, errors)
+    _wait_depth(gate, 2)
+    gate.release(0.01)
+    t_low.join(2); t_high.join(2)
+    assert order == [PRIORITY_REGISTRY, PRIORITY_LLM_SQL] and not errors
+
+def test_full_queue_evicts_lower_priority_waiter_for_registry_work():
+    gate = AdmissionController("t", limit=1, max_queue=1, max_wait=2.0)
+    order, errors = [], []
+    gate.acquire(PRIORITY_REGISTRY)
+    t_low = _queued(gate, PRIORITY_LLM_SQL, order, errors)
+    _wait_depth(gate, 1)
+    t_high = _queued(gate, PRIORITY_REGISTRY, order, errors)
+    t_low.join(2)
+    assert [(p, e.status, e.reason) for p, e in errors] == [(PRIORITY_LLM_SQL, 503, "evicted")]
+    gate.release(0.01)
+    t_high.join(2)
+    assert order == [PRIORITY_REGISTRY]
+    assert gate.snapshot()["rejected"]["evicted"] == 1
+
+def test_full_queue_rejects_arrivals_that_rank_no_higher():
+    gate = AdmissionController("t", limit=1, max_queue=1, max_wait=2.0)
+    order, errors = [], []
+    gate.acquire(PRIORITY_REGISTRY)
+    t = _queued(gate, PRIORITY_REGISTRY, order, errors)
+    _wait_depth(gate, 1)
+    for priority in (PRIORITY_REGISTRY, PRIORITY_LLM_SQL):
+        with pytest.raises(Overloaded) as exc:
+            gate.acquire(priority)
+        assert exc.value.status == 429
+    gate.release(0.01)
+    t.join(2)
+    assert order == [PRIORITY_REGISTRY] and gate.snapshot()["in_flight"] == 0
+
+def test_queued_request_times_out_with_503():
+    gate = AdmissionController("t", limit=1, max_queue=4, max_wait=0.05)
+    gate.acquire()
+    with pytest.raises(Overloaded) as exc:
+        gate.acquire()
+    assert (exc.value.status, exc.value.reason) == (503, "timeout")
+    assert gate.snapshot()["queue_depth"] == 0
+    assert exc.value.to_http().headers["Retry-After"] == "1"
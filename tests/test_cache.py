@@ -0,0 +1,49 @@
+import pathlib, subprocess, sys, textwrap, time
+
+from app.services.cache import SharedCache, SqliteCacheStore, TTLCache
+
+ROOT = pathlib.Path(__file__).resolve().parents[1]
+
+def test_ttl_cache_expires_and_evicts_lru():
+    c = TTLCache(maxsize=2, ttl=0.05)
+    c.set("a", 1); c.set("b", 2)
+    assert c.get("a") == 1           # a is now most recent
+    c.set("c", 3)
+    assert c.get("b") is None and c.get("a") == 1 and c.get("c") == 3
+    time.sleep(0.06)
+    assert c.get("a") is None
+
+def test_entries_are_shared_across_processes(tmp_path):
+    path = str(tmp_path / "cache.db")
+    SharedCache(SqliteCacheStore(path, 1 << 20), "plan", 60).set(("q", "2024"), {"sql": "SELECT 1"})
+    code = textwrap.dedent(f"""
+        from app.services.cache import SharedCache, SqliteCacheStore
+        print(SharedCache(SqliteCacheStore({path!r}, 1 << 20), "plan", 60).get(("q", "2024")))
+    """)
+    out = subprocess.run([sys.executable, "-c", code], cwd=ROOT, capture_output=True, text=True, check=True)
+    assert out.stdout.strip() == "{'sql': 'SELECT 1'}"
+
+def test_namespaces_and_ttl(tmp_path):
+    store = SqliteCacheStore(str(tmp_path / "cache.db"), 1 << 20)
+    plan, narr = SharedCache(store, "plan", 60), SharedCache(store, "narration", 0.05)
+    plan.set("k", 1); narr.set("k", 2)
+    assert plan.get("k") == 1 and narr.get("k") == 2
+    time.sleep(0.06)
+    assert narr.get("k") is None and plan.get("k") == 1
+    plan.clear()
+    assert plan.get("k") is None
+
+def test_size_bound_evicts_least_recently_accessed(tmp_path, monkeypatch):
+    store = SqliteCacheStore(str(tmp_path / "cache.db"), 4000)
+    monkeypatch.setattr(SqliteCacheStore, "_TOUCH_EVERY", 0.0)
+    c = SharedCache(store, "result", 60)
+    for i in range(3):
+        c.set(i, b"x" * 1000)
+        time.sleep(0.01)
+    assert c.get(0) is not None      # touch 0 so 1 becomes the oldest
+    time.sleep(0.01)
+    c.set(3, b"x" * 1000)
+    c.set(4, b"x" * 1000)
+    total = store._con().raw.execute("SELECT SUM(size) FROM cache").fetchone()[0]
+    assert total <= 4000
+    assert c.get(1) is None and c.get(0) is not None and c.get(4) is not None
@@ -0,0 +1,59 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from app.services.chart_builder import OTHER_LABEL, _lttb, build_time_series
+
+@pytest.mark.parametrize("n,threshold", [(10, 3), (1000, 50), (5000, 2000), (7, 100)])
+def test_lttb_keeps_endpoints_and_budget(n, threshold):
+    y = np.sin(np.linspace(0, 20, n)) * 100 + np.arange(n)
+    idx = _lttb(y, threshold)
+    assert idx[0] == 0 and idx[-1] == n - 1
+    assert len(idx) <= max(threshold, 3) if threshold < n else len(idx) == n
+    assert (np.diff(idx) > 0).all()
+
+def test_lttb_keeps_spike():
+    y = np.zeros(1000)
+    y[437] = 50.0
+    assert 437 in _lttb(y, 40)
+
+def _series(periods=400, dims=30):
+    idx = pd.period_range("2000-01", periods=periods, freq="M").astype(str)
+    rows = [(p, float(i * (d + 1)), f"d{d:02d}") for i, p in enumerate(idx) for d in range(dims)]
+    return pd.DataFrame(rows, columns=["period", "value", "region"])
+
+def test_top_n_folds_rest_into_other_and_preserves_totals():
+    df = _series(periods=12, dims=30)
+    meta = {}
+    chart = build_time_series(df, dim_col="region", meta=meta, top_n=5, max_points=0, additive=True)
+    dims = {s.dimension for s in chart.series}
+    assert len(dims) == 6 and OTHER_LABEL in dims
+    assert meta["top_n"]["folded_values"] == 25 and meta["reduced"] is True
+    assert sum(s.value for s in chart.series) == pytest.approx(df["value"].sum())
+
+def test_top_n_drops_rest_of_an_average_kpi():
+    # hours per ticket by region: summing the tail would exceed every real region
+    df = _series(periods=12, dims=30).assign(value=lambda d: 10.0 + d.index % 50)
+    meta = {}
+    chart = build_time_series(df, dim_col="region", meta=meta, top_n=5, max_points=0)
+    dims = {s.dimension for s in chart.series}
+    assert len(dims) == 5 and OTHER_LABEL not in dims
+    assert meta["top_n"] == {"n": 5, "other_label": None, "dropped_values": 25}
+    assert max(s.value for s in chart.series) <= df["value"].max()
+    assert len(chart.series) == 5 * 12
+
+def test_max_points_bounds_grouped_payload():
+    df = _series(periods=400, dims=4)
+    meta = {}
+    chart = build_time_series(df, dim_col="region", meta=meta, top_n=0, max_points=200)
+    assert len(chart.series) <= 200
+    assert meta["downsampled"]["from_points"] == 1600
+    for d in ("d00", "d03"):
+        periods = [s.period for s in chart.series if s.dimension == d]
+        assert periods[0] == "2000-01" and periods[-1] == df["period"].iloc[-1]
+
+def test_small_payload_untouched():
+    df = _series(periods=12, dims=3)
+    meta = {}
+    chart = build_time_series(df, dim_col="region", meta=meta, top_n=12, max_points=2000)
+    assert len(chart.series) == len(df) and "reduced" not in meta
@@ -0,0 +1,72 @@
+import sys, threading, time, types
+
+import pytest
+
+from app.services import planner_llm
+from app.services.admission import AdmissionController, PRIORITY_PLANNER
+from app.services.circuit_breaker import CLOSED, HALF_OPEN, OPEN, CircuitBreaker, CircuitOpen
+
+def _breaker(**kw):
+    opts = dict(window=4, failures=2, slow_secs=0.1, cooldown=0.05)
+    opts.update(kw)
+    return CircuitBreaker("t", **opts)
+
+def _fail(breaker):
+    with pytest.raises(RuntimeError):
+        with breaker.guard():
+            raise RuntimeError("upstream 500")
+
+def test_opens_after_failures_and_rejects():
+    b = _breaker()
+    _fail(b)
+    assert b.state == CLOSED
+    _fail(b)
+    assert b.state == OPEN
+    with pytest.raises(CircuitOpen):
+        with b.guard():
+            pytest.fail("call let through an open circuit")
+    assert b.snapshot()["rejected"] == 1
+
+def test_slow_calls_count_as_failures():
+    b = _breaker(slow_secs=0.01)
+    for _ in range(2):
+        with b.guard():
+            time.sleep(0.02)
+    assert b.state == OPEN
+
+def test_half_open_probe_closes_or_reopens():
+    b = _breaker()
+    _fail(b); _fail(b)
+    time.sleep(0.06)
+    assert b.state == HALF_OPEN
+    _fail(b)
+    assert b.state == OPEN
+    time.sleep(0.06)
+    with b.guard():
+        pass
+    assert b.state == CLOSED and b.snapshot()["window_calls"] == 0
+
+def test_llm_gate_queue_wait_is_not_counted_as_upstream_latency(monkeypatch):
+    breaker = _breaker(slow_secs=0.1)
+    gate = AdmissionController("llm", limit=1, max_queue=4, max_wait=2.0)
+    resp = types.SimpleNamespace(usage=None, model="m",
+                                 choices=[types.SimpleNamespace(message=types.SimpleNamespace(content="{}"))])
+    create = lambda **kw: resp
+    client = types.SimpleNamespace(chat=types.SimpleNamespace(completions=types.SimpleNamespace(create=create)))
+    monkeypatch.setitem(sys.modules, "openai", types.SimpleNamespace(OpenAI=lambda api_key: client))
+    monkeypatch.setattr(planner_llm, "OPENAI_API_KEY", "test-key")
+    monkeypatch.setattr(planner_llm, "OPENAI_BREAKER", breaker)
+    monkeypatch.setattr(planner_llm, "LLM_GATE", gate)
+
+    gate.acquire(PRIORITY_PLANNER)
+    release = threading.Timer(0.25, gate.release, args=(0.25,))
+    release.start()
+    try:
+        t0 = time.monotonic()
+        assert planner_llm._call_llm("prompt") == "{}"
+        assert time.monotonic() - t0 >= 0.2          # it did queue behind the held slot
+    finally:
+        release.join()
+    snap = breaker.snapshot()
+    assert snap["window_calls"] == 1 and snap["window_failures"] == 0
+    assert snap["avg_latency_ms"] < 100
@@ -0,0 +1,62 @@
+import pytest
+
+from app.services import cube as cube_mod
+from app.services.cube import answer_from_cube
+from app.services.executor import run_sql, bind_dates
+from app.services.planner_registry import get_registry, render_kpi_sql
+
+START, END = "2024-01-01", "2024-12-31"
+
+def _direct(kpi_key, dims):
+    reg = get_registry()
+    kpi = reg.kpis[kpi_key]
+    sql = render_kpi_sql(kpi, [reg.dimensions[d] for d in dims])
+    return sql, run_sql(bind_dates(sql, START, END))
+
+def _rows(df):
+    return sorted((str(r[0]), round(float(r[1]), 6), *map(str, r[2:])) for r in df.itertuples(index=False))
+
+@pytest.mark.parametrize("question,kpi,dims", [
+    ("revenue", "revenue_net", []),
+    ("revenue", "revenue_net", ["region"]),
+    ("average resolution time", "avg_resolution_time", ["region"]),
+    ("feature usage", "feature_usage", ["plan_tier"]),
+])
+def test_slice_matches_direct_query(warehouse, question, kpi, dims):
+    df, plan = answer_from_cube(question, START, END, dims)
+    sql, direct = _direct(kpi, dims)
+    assert not direct.empty and plan["sql"] == sql
+    assert _rows(df) == _rows(direct)
+
+def _count_builds(monkeypatch):
+    built = []
+    for name in ("_build_additive", "_build_union"):
+        real = getattr(cube_mod, name)
+        monkeypatch.setattr(cube_mod, name,
+                            lambda kpi, dims, s, e, real=real: built.append([d.alias for d in dims]) or real(kpi, dims, s, e))
+    return built
+
+@pytest.mark.parametrize("question", ["revenue", "feature usage"])
+def test_dimension_switch_is_served_from_one_build(warehouse, monkeypatch, question):
+    built = _count_builds(monkeypatch)
+    metas = [answer_from_cube(question, START, END, dims)[1]["meta"]["cube"]
+             for dims in (["region"], ["plan_tier"], [], ["plan_tier", "region"])]
+    assert metas == ["build", "hit", "hit", "hit"]
+    assert built == [["region", "plan_tier"]]
+
+def test_two_dimensions_return_the_slice_sql(warehouse):
+    df, plan = answer_from_cube("revenue", START, END, ["plan_tier", "region"])
+    sql, direct = _direct("revenue_net", ["plan_tier", "region"])
+    assert plan["sql"] == sql and "UNION ALL" not in plan["sql"]
+    assert round(df["value"].sum(), 6) == round(direct["value"].sum(), 6)
+    assert df["dimension"].str.contains(" · ").all()
+
+def test_additivity_is_opt_in(tmp_path):
+    from app.services.planner_registry import Registry
+    reg = tmp_path / "kpis.yaml"
+    reg.write_text(
+        "kpis:\n"
+        "  - {key: arpu, name: ARPU, unit: USD, sql: 'SELECT 1'}\n"
+        "  - {key: mrr, name: MRR, unit: USD, additive: true, sql: 'SELECT 1'}\n", encoding="utf-8")
+    kpis = Registry(reg).kpis
+    assert not kpis["arpu"].additive and kpis["mrr"].additive
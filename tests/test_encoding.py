@@ -0,0 +1,50 @@
+import gzip, json
+
+import pytest
+from starlette.requests import Request
+
+from app.services import encoding
+from app.services.encoding import ARROW, JSON, MSGPACK, encode_response, negotiate
+
+def _request(accept="", accept_encoding=""):
+    headers = [(b"accept", accept.encode()), (b"accept-encoding", accept_encoding.encode())]
+    return Request({"type": "http", "method": "POST", "path": "/", "headers": headers})
+
+def _payload(n=200):
+    series = [{"period": f"2024-{i % 12 + 1:02d}", "value": float(i), "dimension": f"d{i % 5}"} for i in range(n)]
+    return {"chart": {"type": "line", "series": series, "meta": {"kpi": "revenue_net"}},
+            "insights": ["a"], "sql": ["SELECT 1"]}
+
+def test_negotiation_prefers_highest_q_available_type():
+    assert negotiate(None) == JSON
+    assert negotiate("text/html, */*") == JSON
+    assert negotiate(f"{MSGPACK};q=0") == JSON
+    pytest.importorskip("msgpack")
+    assert negotiate(f"{JSON};q=0.5, {MSGPACK}") == MSGPACK
+
+def test_unavailable_codec_falls_back_to_json(monkeypatch):
+    monkeypatch.setattr(encoding, "_available", lambda media_type: False)
+    assert negotiate(f"{ARROW}, {MSGPACK}") == JSON
+
+def test_json_is_gzipped_above_threshold_only():
+    big = encode_response(_payload(200), _request(accept_encoding="gzip, deflate"))
+    assert big.headers["content-encoding"] == "gzip"
+    assert json.loads(gzip.decompress(big.body)) == _payload(200)
+    small = encode_response({"chart": {"series": []}}, _request(accept_encoding="gzip"))
+    assert "content-encoding" not in small.headers
+    assert big.headers["vary"] == "Accept, Accept-Encoding"
+
+def test_msgpack_is_columnar_and_round_trips():
+    msgpack = pytest.importorskip("msgpack")
+    resp = encode_response(_payload(50), _request(accept=MSGPACK))
+    assert resp.media_type == MSGPACK
+    body = msgpack.unpackb(resp.body, raw=False)
+    cols = body["chart"]["series"]
+    assert body["chart"]["series_format"] == "columnar"
+    assert cols["value"] == [float(i) for i in range(50)]
+    assert body["insights"] == ["a"]
+
+def test_only_x_headers_are_forwarded():
+    resp = encode_response(_payload(1), _request(), headers={"X-Planner": "llm", "content-length": "1"})
+    assert resp.headers["x-planner"] == "llm"
+    assert resp.headers["content-length"] != "1"
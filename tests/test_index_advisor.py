@@ -0,0 +1,43 @@
+import sqlite3
+
+import index_advisor
+import load_ravenstack
+from app.services.partitions import base_table
+from app.services.planner_registry import REG_PATH, Registry
+from conftest import build_warehouse
+from partitions import partitions_of
+
+def _setup(tmp_path, partitioned):
+    db = tmp_path / "w.db"
+    build_warehouse(db, partitioned=partitioned)
+    con = sqlite3.connect(str(db))
+    tables = {base_table(t) or t for t in index_advisor._tables(con)}
+    queries = index_advisor.render_queries(Registry(REG_PATH), "2024-01-01", "2024-12-31")
+    for q in queries:
+        index_advisor.explain(con, q, tables)
+    return con, tables, queries
+
+def test_flags_scans_and_proposes_join_then_range_columns(tmp_path):
+    con, tables, queries = _setup(tmp_path, partitioned=False)
+    tickets = next(q for q in queries if q.label == "avg_resolution_time")
+    assert "support_tickets" in tickets.scans
+    cands = {c.table: c for c in index_advisor.propose(queries, tables) if "avg_resolution_time" in str(c.reasons)}
+    assert cands["support_tickets"].columns[:2] == ("account_id", "submitted_at")
+
+    for c in index_advisor.propose(queries, tables):
+        index_advisor._create(con, c)
+    index_advisor.explain(con, tickets, tables)
+    assert "support_tickets" not in tickets.scans
+    con.close()
+
+def test_advised_indexes_land_on_every_partition(tmp_path, monkeypatch):
+    con, tables, queries = _setup(tmp_path, partitioned=True)
+    cands = [c for c in index_advisor.propose(queries, tables) if c.table == "feature_usage"]
+    assert cands
+    path = tmp_path / "advised_indexes.sql"
+    index_advisor.write_advised(cands, path)
+    monkeypatch.setattr(load_ravenstack, "ADVISED_INDEXES", path)
+    load_ravenstack.apply_advised_indexes(con)
+    indexed = {r[0] for r in con.execute("SELECT tbl_name FROM sqlite_master WHERE type='index' AND name LIKE 'adv_%'")}
+    assert indexed == set(partitions_of(con, "feature_usage"))
+    con.close()
@@ -0,0 +1,46 @@
+import threading
+
+from fastapi.testclient import TestClient
+
+import bench_startup
+from app.core import lifecycle
+from app.core.lifecycle import Startup
+from app.main import app
+from app.routers import health
+
+def test_importing_the_app_defers_heavy_modules():
+    assert bench_startup.probe(ready=False)["loaded"] == []
+
+def test_ready_is_503_until_warm_up_finishes(monkeypatch):
+    gate = threading.Event()
+    monkeypatch.setattr(lifecycle, "_stages", lambda: [("slow", lambda: gate.wait(5))])
+    startup = Startup()
+    monkeypatch.setattr(health, "STARTUP", startup)
+    client = TestClient(app)   # no lifespan: the test drives startup itself
+    startup.start()
+    assert client.get("/health").status_code == 200
+    assert client.get("/health/ready").status_code == 503
+    gate.set()
+    assert startup.wait(5)
+    resp = client.get("/health/ready")
+    assert resp.status_code == 200 and "slow" in resp.json()["stages"]
+
+def test_failed_stage_keeps_the_replica_unready(monkeypatch):
+    def boom():
+        raise RuntimeError("registry missing")
+
+    monkeypatch.setattr(lifecycle, "_stages", lambda: [("registry", boom)])
+    startup = Startup()
+    startup.start()
+    assert startup.wait(5)
+    snap = startup.snapshot()
+    assert not snap["ready"] and snap["done"] and "registry missing" in snap["error"]
+
+def test_real_stages_warm_the_registry_and_engine(warehouse, monkeypatch):
+    monkeypatch.setattr(lifecycle.settings, "WARMUP_QUERIES", ["revenue by region"])
+    startup = Startup()
+    startup.start()
+    assert startup.wait(30)
+    snap = startup.snapshot()
+    assert snap["ready"], snap["error"]
+    assert list(snap["stages"]) == ["imports", "registry", "engine", "queries"]
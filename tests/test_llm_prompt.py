@@ -0,0 +1,41 @@
+import logging, sys, types
+
+from app.services import llm_prompt
+from app.services.llm_prompt import build_prompt, count_tokens, log_llm_usage, static_prefix
+from app.services.planner_registry import REG_PATH
+
+def test_count_tokens_falls_back_when_tiktoken_cannot_load(monkeypatch):
+    broken = types.ModuleType("tiktoken")
+
+    def fail(*a, **kw):
+        raise OSError("could not download encoding")
+
+    broken.encoding_for_model = fail
+    broken.get_encoding = fail
+    monkeypatch.setitem(sys.modules, "tiktoken", broken)
+    assert count_tokens("x" * 40) == 10
+
+def test_prefix_is_stable_and_within_budget():
+    llm_prompt._static_prefix.cache_clear()
+    text, version = static_prefix(REG_PATH)
+    assert count_tokens(text) <= llm_prompt.settings.LLM_PROMPT_TOKEN_BUDGET
+    a, va = build_prompt("revenue by region", REG_PATH, ["region"])
+    b, vb = build_prompt("churn last quarter", REG_PATH, [])
+    assert va == vb == version
+    assert a.startswith(text) and b.startswith(text)
+
+def test_prefix_trims_fewshots_first(monkeypatch):
+    llm_prompt._static_prefix.cache_clear()
+    full, _ = static_prefix(REG_PATH)
+    monkeypatch.setattr(llm_prompt.settings, "LLM_PROMPT_TOKEN_BUDGET", count_tokens(full) - 1)
+    trimmed, _ = static_prefix(REG_PATH)
+    llm_prompt._static_prefix.cache_clear()
+    assert count_tokens(trimmed) < count_tokens(full)
+    assert "Available KPIs" in trimmed
+
+def test_usage_log_carries_prefix_version(caplog):
+    usage = types.SimpleNamespace(prompt_tokens=1000, completion_tokens=50,
+                                  prompt_tokens_details=types.SimpleNamespace(cached_tokens=800))
+    with caplog.at_level(logging.INFO, logger="app.services.llm_prompt"):
+        log_llm_usage("planner", "prompt", types.SimpleNamespace(usage=usage, model="m"), "abc123")
+    assert "prefix_version=abc123" in caplog.text and "cached_tokens=800" in caplog.text
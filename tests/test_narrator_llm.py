@@ -0,0 +1,59 @@
+import threading, time
+
+from app.services import narrator_llm
+
+STATS = {"unit": "USD", "start_value": 100.0, "end_value": 120.0, "total_delta_pct": 20.0,
+         "avg_mom_pct": 2.0, "peak": ("2024-06", 130.0), "lowest": ("2024-01", 100.0)}
+
+def _det(stats):
+    return ["deterministic"]
+
+def test_deadline_returns_deterministic_bullets_and_keeps_llm_running(monkeypatch):
+    finished = threading.Event()
+
+    def slow(stats, df):
+        time.sleep(0.3)
+        finished.set()
+        return ["late llm bullet"]
+
+    monkeypatch.setattr(narrator_llm, "narrate_with_llm", slow)
+    t0 = time.monotonic()
+    bullets, source = narrator_llm.narrate_with_deadline(STATS, None, _det, deadline=0.05)
+    assert (bullets, source) == (["deterministic"], "deadline")
+    assert time.monotonic() - t0 < 0.25
+    assert finished.wait(2.0)   # the LLM call is not cancelled; it fills the cache
+
+def test_llm_within_deadline_wins(monkeypatch):
+    monkeypatch.setattr(narrator_llm, "narrate_with_llm", lambda stats, df: ["llm bullet"])
+    assert narrator_llm.narrate_with_deadline(STATS, None, _det, deadline=1.0) == (["llm bullet"], "llm")
+
+def test_llm_without_bullets_falls_back(monkeypatch):
+    monkeypatch.setattr(narrator_llm, "narrate_with_llm", lambda stats, df: None)
+    assert narrator_llm.narrate_with_deadline(STATS, None, _det, deadline=1.0) == (["deterministic"], "fallback")
+
+def test_saturated_narrator_skips_the_submit(monkeypatch):
+    release, calls = threading.Event(), []
+
+    def slow(stats, df):
+        calls.append(1)
+        release.wait(2)
+        return ["late llm bullet"]
+
+    monkeypatch.setattr(narrator_llm, "narrate_with_llm", slow)
+    monkeypatch.setattr(narrator_llm, "_SLOTS", threading.BoundedSemaphore(1))
+    monkeypatch.setattr(narrator_llm, "_prompt", lambda stats, df: ("k", "prompt"))
+    assert narrator_llm.narrate_with_deadline(STATS, None, _det, deadline=0.01)[1] == "deadline"
+    for _ in range(5):   # late work from the first request still holds the only slot
+        assert narrator_llm.narrate_with_deadline(STATS, None, _det, deadline=1.0) == (["deterministic"], "busy")
+    release.set()
+    for _ in range(100):
+        if narrator_llm._SLOTS.acquire(blocking=False):
+            narrator_llm._SLOTS.release()
+            break
+        time.sleep(0.01)
+    else:
+        raise AssertionError("slot never released")
+    assert len(calls) == 1
+
+def test_pool_is_sized_from_llm_concurrency():
+    assert narrator_llm._POOL._max_workers == narrator_llm.settings.LLM_MAX_CONCURRENCY
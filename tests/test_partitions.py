@@ -0,0 +1,88 @@
+import sqlite3
+
+import pandas as pd
+import pytest
+
+from app.services.executor import bind_dates, prune_partitions, run_sql
+from app.services.partitions import prunable
+from app.services.planner_registry import plan_from_registry
+from conftest import _frames, build_warehouse
+from partitions import archive_partitions, partitions_of, write_partitioned
+from rollups import changed_ranges, rebuild_rollups, refresh_rollups, verify_rollups
+
+START, END = "2024-04-10", "2024-08-31"
+
+def _both(sql):
+    pruned = prune_partitions(sql, START, END)
+    return pruned, run_sql(bind_dates(pruned, START, END)), run_sql(bind_dates(sql, START, END))
+
+@pytest.mark.parametrize("question", ["feature usage by plan tier", "avg resolution time by region"])
+def test_registry_sql_prunes_to_the_same_result(warehouse, question):
+    sql = plan_from_registry(question, START, END)["sql"]
+    pruned, got, want = _both(sql)
+    assert pruned != sql and "_p2024q2" in pruned and "_p2023q3" not in pruned
+    pd.testing.assert_frame_equal(got, want)
+
+def test_date_filter_on_joined_table_does_not_prune(warehouse):
+    sql = ("SELECT COUNT(*) AS n, SUM(f.usage_count) AS value FROM feature_usage f "
+           "JOIN subscriptions s ON s.subscription_id = f.subscription_id "
+           "WHERE s.start_date BETWEEN :start AND :end AND f.usage_date IS NOT NULL")
+    pruned, got, want = _both(sql)
+    assert pruned == sql
+    pd.testing.assert_frame_equal(got, want)
+
+@pytest.mark.parametrize("sql, ok", [
+    ("SELECT * FROM feature_usage f WHERE f.usage_date BETWEEN :start AND :end", True),
+    ("SELECT * FROM feature_usage WHERE usage_date >= :start AND usage_date < :end", True),
+    ("SELECT * FROM subscriptions s JOIN feature_usage f "
+     "ON f.subscription_id = s.subscription_id AND date(f.usage_date) BETWEEN :start AND :end", True),
+    ("SELECT * FROM feature_usage f WHERE f.usage_date >= :start", False),
+    ("SELECT * FROM feature_usage f WHERE f.usage_date BETWEEN :start AND :end OR f.error_count > 0", False),
+    ("SELECT * FROM feature_usage f JOIN subscriptions s ON s.subscription_id = f.subscription_id "
+     "WHERE s.usage_date BETWEEN :start AND :end", False),
+    ("SELECT * FROM feature_usage f JOIN subscriptions s ON s.subscription_id = f.subscription_id "
+     "WHERE usage_date BETWEEN :start AND :end", False),
+    ("SELECT * FROM feature_usage f WHERE f.subscription_id IN "
+     "(SELECT g.subscription_id FROM feature_usage g WHERE g.usage_date BETWEEN :start AND :end)", False),
+    ("SELECT SUM(CASE WHEN f.usage_date BETWEEN :start AND :end THEN 1 END) FROM feature_usage f", False),
+])
+def test_prunable_requires_a_direct_bound_on_each_reference(sql, ok):
+    assert prunable(sql, "feature_usage") is ok
+
+# ---------- archiving keeps rollups whole ----------
+def _late_usage(when: str, n: int = 12) -> pd.DataFrame:
+    df = _frames(seed=3)["feature_usage"].head(n).copy()
+    df["usage_id"] = f"L{when}-" + df["usage_id"]
+    df["usage_date"] = pd.Timestamp(when)
+    return df
+
+def test_rollups_stay_verified_across_archive_and_append(tmp_path):
+    db = tmp_path / "w.db"
+    frames = build_warehouse(db)
+    con = sqlite3.connect(str(db))
+    rebuild_rollups(con)
+    moved = archive_partitions(con, "2024-01-01", tmp_path / "w_archive.db")
+    assert moved and not any(p.endswith("2023q3") for p in partitions_of(con, "feature_usage"))
+    assert verify_rollups(con)
+
+    # late rows for an archived quarter and a live one
+    new = pd.concat([_late_usage("2023-08-15"), _late_usage("2024-05-02")], ignore_index=True)
+    write_partitioned(con, "feature_usage", new, append=True)
+    con.commit()
+    refresh_rollups(con, changed_ranges({"feature_usage": new}))
+    assert verify_rollups(con)
+
+    usage = pd.concat([frames["feature_usage"], new])
+    want = usage.loc[usage["usage_date"].dt.strftime("%Y-%m") == "2023-08", "usage_count"].sum()
+    got = con.execute("SELECT SUM(usage_count) FROM rollup_feature_usage_monthly "
+                      "WHERE month = '2023-08-01'").fetchone()[0]
+    assert got == want
+
+    # archiving the re-created quarter merges it into the archive
+    archive_partitions(con, "2024-01-01", tmp_path / "w_archive.db")
+    assert verify_rollups(con)
+    rebuild_rollups(con)
+    assert con.execute("SELECT SUM(usage_count) FROM rollup_feature_usage_monthly "
+                       "WHERE month = '2023-08-01'").fetchone()[0] == want
+    assert not con.execute("SELECT name FROM temp.sqlite_master").fetchall()
+    con.close()
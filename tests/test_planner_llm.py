@@ -0,0 +1,40 @@
+import pandas as pd
+
+from app.services import planner_llm
+from app.services.executor import run_sql, bind_dates
+from app.services.planner_registry import plan_from_registry
+
+START, END = "2024-01-01", "2024-12-31"
+
+def _registry_rows(question, dims=None):
+    plan = plan_from_registry(question, START, END, dims)
+    return run_sql(bind_dates(plan["sql"], START, END))
+
+def test_speculative_hit_returns_registry_result(warehouse, monkeypatch):
+    calls = []
+
+    def same_intent(question, start, end, dims):
+        calls.append(question)
+        plan = plan_from_registry(question, start, end, dims)
+        plan["meta"]["planner"] = "llm"
+        plan["sql"] = "SELECT 1"   # would be wrong if it ran
+        return plan
+
+    monkeypatch.setattr(planner_llm, "plan_with_llm", same_intent)
+    plan, df = planner_llm._plan_speculative("revenue by region", START, END, None)
+    assert calls and plan["meta"]["speculative"] == "hit"
+    assert not df.empty
+    pd.testing.assert_frame_equal(df, _registry_rows("revenue by region"))
+
+def test_speculative_miss_runs_llm_sql(warehouse, monkeypatch):
+    llm_sql = ("SELECT strftime('%Y-%m', submitted_at) AS period, COUNT(*) AS value "
+               "FROM support_tickets WHERE submitted_at BETWEEN :start AND :end GROUP BY 1 ORDER BY 1")
+
+    def other_intent(question, start, end, dims):
+        return {"sql": llm_sql, "meta": {"kpi": "tickets", "dimension": None, "planner": "llm"}}
+
+    monkeypatch.setattr(planner_llm, "plan_with_llm", other_intent)
+    plan, df = planner_llm._plan_speculative("revenue", START, END, None)
+    assert plan["meta"]["speculative"] == "miss"
+    assert list(df.columns) == ["period", "value"]
+    assert df["value"].sum() == run_sql(bind_dates(llm_sql, START, END))["value"].sum()
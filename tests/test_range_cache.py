@@ -0,0 +1,58 @@
+from app.core.config import Settings
+from app.services import range_cache
+from app.services.executor import run_sql, bind_dates
+from app.services.planner_registry import get_registry, render_kpi_sql
+
+def test_reuse_is_opt_in():
+    assert Settings().RANGE_REUSE is False
+
+def test_overlapping_windows_fetch_only_missing_months(warehouse):
+    sql = render_kpi_sql(get_registry().kpis["revenue_net"], [])
+    fetched = []
+
+    def fetch(s, e):
+        fetched.append((s, e))
+        return run_sql(bind_dates(sql, s, e))
+
+    first = range_cache.fetch_range("k", "2024-01-01", "2024-06-30", fetch)
+    assert fetched == [("2024-01-01", "2024-06-30")]
+    fetched.clear()
+    second = range_cache.fetch_range("k", "2024-04-01", "2024-09-30", fetch)
+    # April and May are reused; June was cut at its last day by the first window's end
+    # bound, so it is fetched again together with the new months
+    assert fetched == [("2024-06-01", "2024-09-30")]
+
+    direct = run_sql(bind_dates(sql, "2024-04-01", "2024-09-30"))
+    assert second["period"].tolist() == direct["period"].tolist()
+    assert second["value"].tolist() == direct["value"].tolist()
+    assert set(first["period"]) & set(second["period"])
+
+def test_partial_month_edges_are_refetched(warehouse):
+    sql = render_kpi_sql(get_registry().kpis["revenue_net"], [])
+    fetched = []
+
+    def fetch(s, e):
+        fetched.append((s, e))
+        return run_sql(bind_dates(sql, s, e))
+
+    range_cache.fetch_range("k2", "2024-01-01", "2024-03-31", fetch)
+    fetched.clear()
+    out = range_cache.fetch_range("k2", "2024-01-15", "2024-03-31", fetch)
+    # January was cached for the whole month; the new window covers only part of it
+    assert fetched == [("2024-01-15", "2024-02-01")]
+    assert out["value"].tolist() == run_sql(bind_dates(sql, "2024-01-15", "2024-03-31"))["value"].tolist()
+
+def test_only_month_local_kpis_reuse_ranges(warehouse, monkeypatch):
+    monkeypatch.setattr(range_cache.settings, "RANGE_REUSE", True)
+    used = []
+    real = range_cache.fetch_range
+    monkeypatch.setattr(range_cache, "fetch_range", lambda key, *a: used.append(key) or real(key, *a))
+    kpis = get_registry().kpis
+    for name in ("revenue_net", "avg_resolution_time"):
+        kpi = kpis[name]
+        sql = render_kpi_sql(kpi, [])
+        out = range_cache.run_registry_sql(sql, "2024-01-01", "2024-06-30", kpi.month_local)
+        assert out["value"].tolist() == run_sql(bind_dates(sql, "2024-01-01", "2024-06-30"))["value"].tolist()
+    # the average over a window is not the stitch of monthly averages: it always runs whole
+    assert kpis["revenue_net"].month_local and not kpis["avg_resolution_time"].month_local
+    assert len(used) == 1
@@ -0,0 +1,49 @@
+import sqlite3
+
+import pandas as pd
+
+from conftest import _frames, build_warehouse
+from partitions import PARTITIONED, write_partitioned
+from rollups import changed_ranges, rebuild_rollups, refresh_rollups, verify_rollups
+
+def _new_rows() -> dict:
+    """Late rows landing in already-rolled-up months plus rows in a new month."""
+    f = _frames(seed=11)
+    usage = f["feature_usage"].head(40).copy()
+    usage["usage_id"] = "N" + usage["usage_id"]
+    usage.loc[:19, "usage_date"] = pd.Timestamp("2024-03-31 23:30:00")
+    usage.loc[20:, "usage_date"] = pd.Timestamp("2025-03-15")
+    tickets = f["support_tickets"].head(10).copy()
+    tickets["ticket_id"] = "N" + tickets["ticket_id"]
+    tickets["submitted_at"] = pd.Timestamp("2024-02-10")
+    subs = f["subscriptions"].head(5).copy()
+    subs["subscription_id"] = "N" + subs["subscription_id"]
+    subs["start_date"] = pd.Timestamp("2025-06-01")   # beyond the current horizon
+    return {"feature_usage": usage, "support_tickets": tickets, "subscriptions": subs}
+
+def _append(con, frames):
+    for table, df in frames.items():
+        if table in PARTITIONED:
+            write_partitioned(con, table, df, append=True)
+        else:
+            df.to_sql(table, con, if_exists="append", index=False)
+    con.commit()
+
+def test_incremental_refresh_after_append_matches_rebuild(tmp_path):
+    db = tmp_path / "w.db"
+    build_warehouse(db)
+    con = sqlite3.connect(str(db))
+    rebuild_rollups(con)
+    assert verify_rollups(con)
+    new = _new_rows()
+    _append(con, new)
+    assert not verify_rollups(con)      # stale until refreshed
+    refresh_rollups(con, changed_ranges(new))
+    assert verify_rollups(con)
+    horizon = con.execute("SELECT MAX(month) FROM rollup_mrr_monthly").fetchone()[0]
+    assert horizon == "2025-06-01"
+
+def test_changed_ranges_spans_month_starts():
+    ranges = changed_ranges(_new_rows())
+    assert ranges["feature_usage"] == ("2024-03-01", "2025-03-01")
+    assert ranges["support_tickets"] == ("2024-02-01", "2024-02-01")
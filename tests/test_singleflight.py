@@ -0,0 +1,76 @@
+import copy, threading, time
+
+import pytest
+
+from app.services.singleflight import SingleFlight
+
+def _race(sf, fn, n=5):
+    """Start n callers for one key; returns their results in start order."""
+    results, errors = [None] * n, []
+    started = threading.Barrier(n)
+
+    def call(i):
+        started.wait()
+        try:
+            results[i] = sf.do("k", fn)
+        except Exception as e:   # noqa: BLE001
+            errors.append(e)
+
+    threads = [threading.Thread(target=call, args=(i,)) for i in range(n)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join(5)
+    return results, errors
+
+def test_concurrent_callers_run_fn_once():
+    runs = []
+
+    def slow():
+        runs.append(1)
+        time.sleep(0.2)
+        return {"meta": {"a": 1}}
+
+    results, errors = _race(SingleFlight("t", clone=copy.deepcopy), slow)
+    assert not errors and len(runs) == 1
+    assert all(r == {"meta": {"a": 1}} for r in results)
+
+def test_leader_and_waiters_get_independent_results():
+    gate = threading.Event()
+    sf = SingleFlight("t", clone=copy.deepcopy)
+    out = {}
+
+    def leader():
+        r = sf.do("k", lambda: (gate.wait(2), {"meta": {"a": 1}})[1])
+        r["meta"]["downsampled"] = True          # router-style mutation right after return
+        out["leader"] = r
+
+    def waiter():
+        time.sleep(0.05)
+        out["waiter"] = sf.do("k", lambda: {"meta": {"never": "runs"}})
+
+    t1, t2 = threading.Thread(target=leader), threading.Thread(target=waiter)
+    t1.start(); t2.start()
+    time.sleep(0.15)
+    gate.set()
+    t1.join(2); t2.join(2)
+    assert out["leader"] == {"meta": {"a": 1, "downsampled": True}}
+    assert out["waiter"] == {"meta": {"a": 1}}
+    assert out["leader"] is not out["waiter"]
+
+def test_errors_are_shared_and_keys_released():
+    sf = SingleFlight("t")
+
+    def boom():
+        time.sleep(0.1)
+        raise ValueError("nope")
+
+    results, errors = _race(sf, boom, n=3)
+    assert len(errors) == 3 and all(isinstance(e, ValueError) for e in errors)
+    assert sf.in_flight() == 0
+    assert sf.do("k", lambda: 42) == 42
+
+def test_uncontended_call_is_not_cloned():
+    value = {"x": 1}
+    sf = SingleFlight("t", clone=lambda v: pytest.fail("clone called without waiters"))
+    assert sf.do("k", lambda: value) is value
@@ -0,0 +1,44 @@
+import sqlite3
+
+import pytest
+
+from app.services.executor import run_sql_guarded
+from app.services.sql_safety import authorize
+
+PARAMS = {"start": "2024-01-01", "end": "2024-12-31"}
+
+def _prepare(db, sql):
+    con = sqlite3.connect(str(db))
+    con.set_authorizer(authorize)
+    try:
+        return con.execute(sql, PARAMS).fetchall()
+    finally:
+        con.close()
+
+@pytest.mark.parametrize("sql", [
+    "SELECT name FROM sqlite_master",
+    "SELECT * FROM _partitions",
+    "SELECT name, lo FROM _partitions WHERE base = 'feature_usage'",
+    "SELECT a.country FROM accounts a JOIN _partitions p ON p.name = a.country",
+    "WITH x AS (SELECT sql FROM sqlite_master) SELECT * FROM x",
+])
+def test_authorizer_denies_catalog_tables(warehouse, sql):
+    with pytest.raises(sqlite3.DatabaseError, match="prohibited|not authorized"):
+        _prepare(warehouse, sql)
+
+def test_authorizer_denies_writes_and_pragmas(warehouse):
+    for sql in ("DELETE FROM accounts", "PRAGMA table_info(accounts)",
+                "ATTACH DATABASE ':memory:' AS x"):
+        with pytest.raises(sqlite3.DatabaseError):
+            _prepare(warehouse, sql)
+
+def test_authorizer_allows_allowlisted_reads_through_partition_views(warehouse):
+    rows = _prepare(warehouse, "SELECT COUNT(*), SUM(usage_count) FROM feature_usage "
+                               "WHERE usage_date BETWEEN :start AND :end")
+    assert rows[0][0] > 0
+
+def test_run_sql_guarded_rejects_before_reading(warehouse):
+    with pytest.raises(sqlite3.DatabaseError):
+        run_sql_guarded("SELECT name FROM sqlite_master", {})
+    df = run_sql_guarded("SELECT country, COUNT(*) AS n FROM accounts GROUP BY 1", {})
+    assert df["n"].sum() == 40
@@ -0,0 +1,95 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from app.services import trend_sql
+from app.services.chart_builder import OTHER_LABEL
+from app.services.executor import bind_dates, run_sql
+from app.services.planner_registry import get_registry, plan_from_registry, render_kpi_sql
+
+START, END = "2024-01-01", "2024-12-31"
+
+def _pandas_stats(df: pd.DataFrame) -> dict:
+    """The frame-based stats /ask computes when TREND_STATS_SQL is off."""
+    period, value = df.columns[0], df.columns[1]
+    agg = df.groupby(period)[value].sum().reset_index() if len(df.columns) >= 3 else df.fillna({value: 0})
+    s, periods = agg[value].values, agg[period].astype(str).values
+    mom = [((s[i] - s[i - 1]) / (s[i - 1] or 1) * 100.0) for i in range(1, len(s))] or [0.0]
+    out = {"start_value": float(s[0]), "end_value": float(s[-1]), "avg_mom_pct": float(np.mean(mom)),
+           "peak": (periods[int(np.argmax(s))], float(s.max())),
+           "lowest": (periods[int(np.argmin(s))], float(s.min())), "top_contrib": None}
+    if len(df.columns) >= 3:
+        snap = df[df[period] == periods[-1]]
+        snap = snap.assign(share=snap[value] / (snap[value].sum() or 1.0) * 100.0).sort_values("share", ascending=False)
+        out["top_contrib"] = [(r[df.columns[2]], float(r[value]), float(r["share"])) for _, r in snap.iterrows()]
+    return out
+
+def _plan(question):
+    plan = plan_from_registry(question, START, END)
+    return plan["sql"], plan["meta"], run_sql(bind_dates(plan["sql"], START, END))
+
+@pytest.mark.parametrize("question", ["feature usage by plan tier", "avg resolution time by region"])
+def test_sql_stats_match_frame_stats(warehouse, question):
+    sql, meta, df = _plan(question)
+    stats, _ = trend_sql.summarize(sql, START, END, meta, top_n=None, top_k=100)
+    if not meta["additive"]:
+        # an average can't be summed across regions: the trend is the ungrouped KPI
+        kpi = get_registry().kpis[meta["kpi"]]
+        df = run_sql(bind_dates(render_kpi_sql(kpi, []), START, END))
+    want = _pandas_stats(df)
+    for k in ("start_value", "end_value", "avg_mom_pct"):
+        assert stats[k] == pytest.approx(want[k])
+    assert stats["peak"][0] == want["peak"][0] and stats["peak"][1] == pytest.approx(want["peak"][1])
+    assert stats["lowest"][0] == want["lowest"][0] and stats["lowest"][1] == pytest.approx(want["lowest"][1])
+    if want["top_contrib"] is None:
+        assert stats["top_contrib"] is None
+    else:
+        assert [d for d, _, _ in stats["top_contrib"]] == [d for d, _, _ in want["top_contrib"]]
+        assert [s for _, _, s in stats["top_contrib"]] == pytest.approx([s for _, _, s in want["top_contrib"]])
+
+def test_top_k_limits_contributors(warehouse):
+    sql, meta, _ = _plan("feature usage by region")
+    stats, _ = trend_sql.summarize(sql, START, END, meta, top_n=None, top_k=2)
+    assert len(stats["top_contrib"]) == 2
+
+def test_additive_series_folds_rest_into_other(warehouse):
+    sql, meta, df = _plan("feature usage by region")
+    _, series = trend_sql.summarize(sql, START, END, meta, top_n=3, top_k=5)
+    dim = meta["dimension"]
+    assert meta["top_n"]["folded_values"] == df[dim].nunique() - 3
+    per_period = series.groupby("period")[dim].nunique()
+    assert (per_period <= 4).all() and OTHER_LABEL in set(series[dim])
+    pd.testing.assert_series_equal(series.groupby("period")["value"].sum(), df.groupby("period")["value"].sum(),
+                                   check_exact=False, check_dtype=False)
+
+def test_non_additive_series_drops_rest_instead_of_summing(warehouse):
+    sql, meta, df = _plan("avg resolution time by region")
+    _, series = trend_sql.summarize(sql, START, END, meta, top_n=3, top_k=5)
+    dim = meta["dimension"]
+    assert meta["top_n"] == {"n": 3, "other_label": None, "dropped_values": df[dim].nunique() - 3}
+    assert OTHER_LABEL not in set(series[dim]) and series[dim].nunique() == 3
+    # every point is a real region's average, untouched
+    kept = df[df[dim].isin(set(series[dim]))].sort_values(["period", dim]).reset_index(drop=True)
+    pd.testing.assert_frame_equal(series, kept, check_dtype=False)
+
+def _count_statements(monkeypatch):
+    calls = []
+    for name in ("run_sql", "run_registry_sql"):
+        real = getattr(trend_sql, name)
+        monkeypatch.setattr(trend_sql, name, lambda *a, name=name, real=real: calls.append(name) or real(*a))
+    return calls
+
+def test_grouped_summary_and_series_are_one_statement(warehouse, monkeypatch):
+    calls = _count_statements(monkeypatch)
+    sql, meta, df = _plan("feature usage by plan tier")
+    stats, series = trend_sql.summarize(sql, START, END, meta, top_n=10, top_k=5)
+    assert calls == ["run_sql"] and stats is not None
+    pd.testing.assert_frame_equal(series, df.sort_values(["period", "plan_tier"]).reset_index(drop=True),
+                                  check_dtype=False)
+
+def test_ungrouped_plan_skips_the_sql_summary(warehouse, monkeypatch):
+    calls = _count_statements(monkeypatch)
+    sql, meta, df = _plan("revenue trend")
+    stats, series = trend_sql.summarize(sql, START, END, meta, top_n=10, top_k=5)
+    assert calls == ["run_registry_sql"] and stats is None and "stats_source" not in meta
+    pd.testing.assert_frame_equal(series, df)